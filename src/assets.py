@@ -0,0 +1,168 @@
+import json
+import os
+import shutil
+
+from copystatic import CopyStats, remove_empty_dirs, run_copies, scan_tree
+from output import file_hash, temp_output_path, write_if_changed, write_json_atomic
+from text_to_html import set_url_rewriter
+
+HASH_LENGTH = 12
+
+# Site URL -> fingerprinted URL, e.g. "/index.css" -> "/index.0123456789ab.css".
+# Set by load_asset_map(), which installs fingerprinted_url as the
+# renderer's URL rewriter; stays empty unless --fingerprint is on.
+ASSET_MAP = {}
+ASSET_MAP_DIGEST = ""
+# The reverse, for reporting links as they were written in the source
+ORIGINAL_URLS = {}
+
+
+class AssetStats(CopyStats):
+    def __init__(self):
+        super().__init__()
+        self.deduplicated = 0
+
+    def __repr__(self):
+        return (
+            f"AssetStats(copied: {self.copied}, skipped: {self.skipped}, pruned: {self.pruned}, "
+            f"deduplicated: {self.deduplicated})"
+        )
+
+
+class HashCache():
+    # Content hashes of static files keyed by path and checked against
+    # (size, mtime), so an unchanged asset is never read again
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.used = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return f"HashCache({self.path}, entries: {len(self.entries)})"
+
+    @classmethod
+    def load(cls, path):
+        cache = cls(path)
+        try:
+            with open(path) as f:
+                cache.entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+        return cache
+
+    def digest(self, path, stat=None):
+        if stat is None:
+            stat = os.stat(path)
+        entry = self.entries.get(path)
+        if entry is not None and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            self.hits += 1
+        else:
+            self.misses += 1
+            entry = [stat.st_size, stat.st_mtime_ns, file_hash(path)]
+            self.entries[path] = entry
+        self.used[path] = entry
+        return entry[2]
+
+    def save(self):
+        # Only files seen by this build are kept
+        write_json_atomic(self.path, self.used)
+        self.entries = self.used
+        self.used = {}
+
+
+def fingerprint_path(rel_path, digest):
+    root, extension = os.path.splitext(rel_path)
+    return f"{root}.{digest[:HASH_LENGTH]}{extension}"
+
+
+def link_duplicate(existing_path, dest_path):
+    temp_path = temp_output_path(dest_path)
+    try:
+        os.link(existing_path, temp_path)
+    except OSError:
+        shutil.copy(existing_path, temp_path)  # cross-device or unsupported filesystem
+    os.replace(temp_path, dest_path)
+
+
+def build_assets(source_directory, dest_directory, hash_cache, previous_map=None, jobs=1, mode="copy", verbose=False):
+    # Copies every static file to a content-addressed name. Byte-identical
+    # files are stored once and hardlinked under their other names.
+    # Returns the new asset map; outputs only the previous map produced
+    # are pruned.
+    stats = AssetStats()
+    asset_map = {}
+    stored = {}
+    copies = []
+    duplicates = []
+    for rel_path, dir_entry in scan_tree(source_directory, dest_directory):
+        digest = hash_cache.digest(dir_entry.path, dir_entry.stat())
+        output_rel_path = fingerprint_path(rel_path, digest)
+        asset_map["/" + rel_path] = "/" + output_rel_path
+        dest_path = os.path.join(dest_directory, output_rel_path)
+        if digest in stored:
+            duplicates.append((stored[digest], dest_path))
+        elif os.path.exists(dest_path):
+            # The name is the content hash, so an existing file is current
+            stored[digest] = dest_path
+            stats.skipped += 1
+        else:
+            stored[digest] = dest_path
+            copies.append((dir_entry.path, dest_path))
+
+    stats.changed = run_copies(copies, jobs, mode, verbose)
+    stats.copied = len(stats.changed)
+    for existing_path, dest_path in duplicates:
+        stats.deduplicated += 1
+        if os.path.exists(dest_path) and os.path.samefile(existing_path, dest_path):
+            continue
+        link_duplicate(existing_path, dest_path)
+        stats.changed.append(dest_path)
+
+    live_outputs = set(asset_map.values())
+    for url in set((previous_map or {}).values()) - live_outputs:
+        output_path = os.path.join(dest_directory, url[1:])
+        if os.path.exists(output_path):
+            os.remove(output_path)
+            remove_empty_dirs(os.path.dirname(output_path), dest_directory)
+            stats.removed.append(output_path)
+        stats.pruned += 1
+    return asset_map, stats
+
+
+def read_asset_map(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_asset_map(path, asset_map):
+    # Rewritten only when the map changes, so its mtime can stand in for
+    # "some asset changed" as a page input in the dependency graph
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def write(temp_path):
+        with open(temp_path, "w") as f:
+            json.dump(asset_map, f, indent=2, sort_keys=True)
+
+    return write_if_changed(path, write)[1]
+
+
+def load_asset_map(path=None):
+    # Returns True when the map in use changed
+    global ASSET_MAP, ASSET_MAP_DIGEST, ORIGINAL_URLS
+    digest = file_hash(path) if path is not None else ""
+    if digest == ASSET_MAP_DIGEST:
+        return False
+    ASSET_MAP = read_asset_map(path) if path is not None else {}
+    ASSET_MAP_DIGEST = digest
+    ORIGINAL_URLS = {fingerprinted: url for url, fingerprinted in ASSET_MAP.items()}
+    set_url_rewriter(fingerprinted_url if ASSET_MAP else None)
+    return True
+
+
+def fingerprinted_url(url):
+    return ASSET_MAP.get(url, url)
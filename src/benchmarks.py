@@ -0,0 +1,383 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import corpus
+from copystatic import recursive_copier
+from generate_page import markdown_file_to_html_parallel
+from htmlnode import ParentNode
+from split_delimiter import (
+    split_nodes_delimiter, split_nodes_image, split_nodes_link, text_to_textnodes, markdown_to_html_node,
+    markdown_file_to_html, iter_block_spans, block_to_block_type, markdown_to_blocks,
+    clear_inline_cache, inline_cache_info
+)
+from textnode import TextNode, TextType
+
+
+def time_call(func, *args, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def count_nodes(node):
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        count += 1
+        if isinstance(node, ParentNode):
+            stack.extend(node.children)
+    return count
+
+
+def five_pass_text_to_textnodes(text):
+    # The pre-tokenizer pipeline, kept here as the baseline to beat
+    nodes = [TextNode(text, TextType.TEXT)]
+    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
+    nodes = split_nodes_delimiter(nodes, "*", TextType.ITALIC)
+    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
+    nodes = split_nodes_image(nodes)
+    nodes = split_nodes_link(nodes)
+    return nodes
+
+
+def bench_split_nodes_delimiter():
+    nodes = [TextNode(paragraph, TextType.TEXT) for paragraph in corpus.paragraph_heavy_document(500)]
+
+    def run():
+        split_nodes_delimiter(split_nodes_delimiter(nodes, "**", TextType.BOLD), "`", TextType.CODE)
+
+    return {"name": "split_nodes_delimiter", "paragraphs": len(nodes), "seconds": time_call(run)}
+
+
+def bench_split_nodes_image_link():
+    nodes = [TextNode(paragraph, TextType.TEXT) for paragraph in corpus.paragraph_heavy_document(500)]
+    return {
+        "name": "split_nodes_image_link",
+        "paragraphs": len(nodes),
+        "image_seconds": time_call(split_nodes_image, nodes),
+        "link_seconds": time_call(split_nodes_link, nodes),
+    }
+
+
+def bench_inline_tokenizer():
+    paragraphs = corpus.paragraph_heavy_document()
+
+    def run(tokenize):
+        for paragraph in paragraphs:
+            tokenize(paragraph)
+
+    five_pass = time_call(run, five_pass_text_to_textnodes)
+    single_pass = time_call(run, text_to_textnodes)
+    return {
+        "name": "inline_tokenizer",
+        "paragraphs": len(paragraphs),
+        "five_pass_seconds": five_pass,
+        "single_pass_seconds": single_pass,
+        "speedup": five_pass / single_pass,
+    }
+
+
+def bench_link_splitting():
+    # Per-link cost should stay flat as the paragraph grows; the old
+    # str.split implementation got slower per link with every match.
+    small = [TextNode(corpus.link_heavy_paragraph(1000), TextType.TEXT)]
+    large = [TextNode(corpus.link_heavy_paragraph(10000), TextType.TEXT)]
+    small_seconds = time_call(split_nodes_link, small)
+    large_seconds = time_call(split_nodes_link, large)
+    return {
+        "name": "link_splitting",
+        "links": 10000,
+        "seconds": large_seconds,
+        "per_link_growth": (large_seconds / 10000) / (small_seconds / 1000),
+    }
+
+
+def bench_markdown_to_blocks():
+    markdown = corpus.document(sections=1000)
+    return {"name": "markdown_to_blocks", "bytes": len(markdown), "seconds": time_call(markdown_to_blocks, markdown)}
+
+
+def bench_block_to_block_type():
+    blocks = markdown_to_blocks(corpus.document(sections=1000))
+
+    def run():
+        for block in blocks:
+            block_to_block_type(block)
+
+    return {"name": "block_to_block_type", "blocks": len(blocks), "seconds": time_call(run)}
+
+
+def bench_to_html():
+    rng = random.Random(0)
+    markdown = "\n\n".join([
+        corpus.document(sections=500),
+        corpus.huge_code_block(rng),
+        corpus.long_list(rng, 2000),
+    ])
+    root = markdown_to_html_node(markdown)
+    return {
+        "name": "to_html",
+        "nodes": count_nodes(root),
+        "seconds": time_call(root.to_html),
+        "markdown_to_html_node_seconds": time_call(markdown_to_html_node, markdown, repeat=3),
+    }
+
+
+def bench_recursive_copier():
+    with tempfile.TemporaryDirectory() as temp:
+        content_directory, static_directory = corpus.write_site(temp, pages=0, static_files=2000)
+        runs = itertools.count()
+
+        def run(jobs):
+            # A fresh destination every time: copying into an existing
+            # public/ would time the unchanged-file skip instead
+            public_directory = os.path.join(temp, f"public{next(runs)}")
+            recursive_copier(static_directory, public_directory, jobs, "copy", False)
+
+        serial = time_call(run, 1, repeat=3)
+        parallel = time_call(run, 8, repeat=3)
+    return {"name": "recursive_copier", "files": 2000, "serial_seconds": serial, "jobs_8_seconds": parallel}
+
+
+def bench_node_memory():
+    markdown = corpus.document(sections=1000)
+
+    tracemalloc.start()
+    text_nodes = [TextNode("some text", TextType.TEXT) for _ in range(100000)]
+    text_node_bytes, _ = tracemalloc.get_traced_memory()
+    del text_nodes
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    root = markdown_to_html_node(markdown)
+    html_tree_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    nodes = count_nodes(root)
+    return {
+        "name": "node_memory",
+        "text_node_bytes_per_node": text_node_bytes / 100000,
+        "html_nodes": nodes,
+        "html_bytes_per_node": html_tree_bytes / nodes,
+        "markdown_to_html_node_peak_bytes": peak_bytes,
+    }
+
+
+def bench_streaming_memory():
+    with tempfile.TemporaryDirectory() as temp:
+        source_path = os.path.join(temp, "large.md")
+        dest_path = os.path.join(temp, "large.html")
+        with open(source_path, "w") as f:
+            f.write(corpus.document(sections=2000))
+
+        tracemalloc.start()
+        with open(source_path) as f:
+            html = markdown_to_html_node(f.read()).to_html()
+        with open(dest_path, "w") as f:
+            f.write(html)
+        del html
+        _, in_memory_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        markdown_file_to_html(source_path, dest_path)
+        _, streaming_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        source_bytes = os.path.getsize(source_path)
+    return {
+        "name": "streaming_memory",
+        "source_bytes": source_bytes,
+        "in_memory_peak_bytes": in_memory_peak,
+        "streaming_peak_bytes": streaming_peak,
+    }
+
+
+def joined_blocks(markdown):
+    # markdown_to_blocks as it was before block spans: copy every line,
+    # then join each block back together
+    results = []
+    current_block = []
+    for line in markdown.split("\n"):
+        if line.strip() == "":
+            if current_block:
+                results.append("\n".join(current_block).strip())
+                current_block = []
+        else:
+            current_block.append(line)
+    if current_block:
+        results.append("\n".join(current_block).strip())
+    return results
+
+
+def bench_block_spans():
+    markdown = corpus.document(sections=2000)
+
+    def joined_path():
+        for block in joined_blocks(markdown):
+            block_type = block_to_block_type(block)
+            if block_type in ("ordered_list", "unordered_list"):
+                block.split("\n")
+
+    def span_path():
+        for span in iter_block_spans(markdown):
+            block_to_block_type(span.text, span.lines)
+
+    results = {"name": "block_spans"}
+    for label, func in (("joined", joined_path), ("spans", span_path)):
+        tracemalloc.start()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[f"{label}_peak_bytes"] = peak
+        results[f"{label}_seconds"] = time_call(func)
+    return results
+
+
+def bench_inline_cache():
+    # Many small pages sharing navigation, callouts and list items
+    boilerplate = "* [Home](/index.html)\n* [Blog](/blog.html)\n* [About](/about.html)\n\n> **Note:** this page is *generated*"
+    pages = [f"# Page {i}\n\n{boilerplate}\n\n{corpus.sentence(random.Random(i))}" for i in range(2000)]
+
+    def per_page_cache():
+        # As if nothing carried over from one page to the next
+        for page in pages:
+            clear_inline_cache()
+            markdown_to_html_node(page)
+
+    def shared_cache():
+        clear_inline_cache()
+        for page in pages:
+            markdown_to_html_node(page)
+
+    shared_cache()
+    info = inline_cache_info()
+    return {
+        "name": "inline_cache",
+        "pages": len(pages),
+        "hit_rate": info.hits / (info.hits + info.misses),
+        "per_page_seconds": time_call(per_page_cache, repeat=3),
+        "shared_seconds": time_call(shared_cache, repeat=3),
+    }
+
+
+def bench_parallel_blocks():
+    # One huge page, whole in this process versus block runs across workers
+    jobs = min(os.cpu_count() or 1, 4)
+    with tempfile.TemporaryDirectory() as temp:
+        source_path = os.path.join(temp, "huge.md")
+        dest_path = os.path.join(temp, "huge.html")
+        with open(source_path, "w") as f:
+            f.write(corpus.document(sections=4000))
+        serial = time_call(markdown_file_to_html, source_path, dest_path, repeat=3)
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            def run():
+                markdown_file_to_html_parallel(source_path, dest_path, executor=executor, chunk_bytes=256 * 1024)
+
+            parallel = time_call(run, repeat=3)
+        source_bytes = os.path.getsize(source_path)
+    return {
+        "name": "parallel_blocks",
+        "source_bytes": source_bytes,
+        "jobs": jobs,
+        "serial_seconds": serial,
+        "parallel_seconds": parallel,
+    }
+
+
+BENCHMARKS = [
+    bench_split_nodes_delimiter,
+    bench_split_nodes_image_link,
+    bench_inline_tokenizer,
+    bench_link_splitting,
+    bench_markdown_to_blocks,
+    bench_block_to_block_type,
+    bench_to_html,
+    bench_recursive_copier,
+    bench_node_memory,
+    bench_streaming_memory,
+    bench_block_spans,
+    bench_inline_cache,
+    bench_parallel_blocks,
+]
+
+
+def compare(results, baseline, threshold):
+    # Any *_seconds or *_bytes metric that grew by more than threshold
+    # against the baseline run counts as a regression.
+    regressions = []
+    for name, metrics in results.items():
+        old_metrics = baseline.get("results", {}).get(name, {})
+        for key, value in metrics.items():
+            old_value = old_metrics.get(key)
+            if not (key.endswith("seconds") or key.endswith("bytes")) or not old_value:
+                continue
+            if value > old_value * (1 + threshold):
+                regressions.append(f"{name}.{key}: {old_value:.6g} -> {value:.6g} (+{value / old_value - 1:.0%})")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Time each stage of the site generator")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results from an earlier run to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed growth before --compare fails (default: %(default)s)")
+    parser.add_argument("--only", action="append", default=[],
+                        help="run only the named benchmark; may be repeated")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = {}
+    for benchmark in BENCHMARKS:
+        name = benchmark.__name__[len("bench_"):]
+        if args.only and name not in args.only:
+            continue
+        result = benchmark()
+        result_name = result.pop("name")
+        results[result_name] = result
+        details = ", ".join(
+            f"{key}: {value:.4f}" if isinstance(value, float) else f"{key}: {value}"
+            for key, value in result.items()
+        )
+        print(f"{result_name}: {details}")
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from output import same_content, temp_output_path
+
+
+class CopyStats():
+    def __init__(self):
+        self.copied = 0
+        self.skipped = 0
+        self.pruned = 0
+        self.changed = []
+        self.removed = []
+
+    def __repr__(self):
+        return f"CopyStats(copied: {self.copied}, skipped: {self.skipped}, pruned: {self.pruned})"
+
+
+COPY_MODES = ("copy", "hardlink", "reflink")
+FICLONE = 0x40049409  # linux/fs.h, lets btrfs/xfs share extents between files
+
+
+def recursive_copier(source_directory, static_site_directory, jobs=1, mode="copy", verbose=True):
+    stats = CopyStats()
+    copies = []
+    for rel_path, dir_entry in scan_tree(source_directory, static_site_directory):
+        copies.append((os.path.join(source_directory, rel_path), os.path.join(static_site_directory, rel_path)))
+    stats.changed = run_copies(copies, jobs, mode, verbose)
+    stats.copied = len(stats.changed)
+    stats.skipped = len(copies) - stats.copied
+    return stats
+
+
+def scan_tree(source_directory, static_site_directory=None):
+    # Walks with os.scandir so file/dir checks use the cached dirent type
+    # instead of one stat call each; mirrors directories as it goes.
+    if static_site_directory is not None:
+        os.makedirs(static_site_directory, exist_ok=True)
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        with os.scandir(os.path.join(source_directory, rel_dir)) as entries:
+            entries = sorted(entries, key=lambda entry: entry.name)
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            if entry.is_file():
+                yield rel_path, entry
+            elif entry.is_dir():
+                if static_site_directory is not None:
+                    os.makedirs(os.path.join(static_site_directory, rel_path), exist_ok=True)
+                stack.append(rel_path)
+
+
+def reflink_file(source_path, dest_path):
+    import fcntl
+    with open(source_path, "rb") as source, open(dest_path, "wb") as dest:
+        fcntl.ioctl(dest.fileno(), FICLONE, source.fileno())
+    shutil.copymode(source_path, dest_path)
+
+
+def copy_file(source_path, dest_path, mode="copy"):
+    # Returns False when dest_path already holds the same bytes and is left
+    # alone. A hardlink into static/ only counts as unchanged in hardlink
+    # mode; otherwise it is replaced so public/ can never write through it.
+    try:
+        linked = os.path.samefile(source_path, dest_path)
+    except FileNotFoundError:
+        linked = False
+    if linked and mode == "hardlink":
+        return False
+    if not linked and same_content(source_path, dest_path):
+        return False
+
+    # The new file is built beside dest_path and renamed over it, so a
+    # reader never sees it half-written and old hardlinks are not touched
+    temp_path = temp_output_path(dest_path)
+    try:
+        place_file(source_path, temp_path, mode)
+        os.replace(temp_path, dest_path)
+    except BaseException:
+        if os.path.lexists(temp_path):
+            os.remove(temp_path)
+        raise
+    return True
+
+
+def place_file(source_path, dest_path, mode="copy"):
+    if mode == "hardlink":
+        try:
+            os.link(source_path, dest_path)
+            return
+        except OSError:
+            pass  # cross-device or unsupported filesystem
+    elif mode == "reflink":
+        try:
+            reflink_file(source_path, dest_path)
+            return
+        except (ImportError, OSError):
+            pass
+    # shutil.copyfile uses sendfile/copy_file_range where the kernel has them
+    shutil.copy(source_path, dest_path)
+
+
+def run_copies(copies, jobs=1, mode="copy", verbose=False):
+    if mode not in COPY_MODES:
+        raise ValueError(f"unknown copy mode: {mode}")
+    if jobs is None or jobs < 1:
+        jobs = os.cpu_count() or 1
+    # Returns the destinations that were actually written
+    if jobs == 1 or len(copies) < 2:
+        written = [copy_file(source_path, dest_path, mode) for source_path, dest_path in copies]
+    else:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(copy_file, source_path, dest_path, mode) for source_path, dest_path in copies]
+            written = [future.result() for future in futures]
+    changed = [copy for copy, was_written in zip(copies, written) if was_written]
+    if verbose and changed:
+        print("\n".join(f"Copying file: {source_path} -> {dest_path}" for source_path, dest_path in changed))
+    return [dest_path for source_path, dest_path in changed]
+
+
+def remove_empty_dirs(directory, stop_directory):
+    stop_directory = os.path.abspath(stop_directory)
+    directory = os.path.abspath(directory)
+    while directory != stop_directory and directory.startswith(stop_directory):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            break
+        directory = os.path.dirname(directory)
+
+
+def sync_static(source_directory, static_site_directory, graph, use_hash=False, jobs=1, mode="copy", verbose=False):
+    # graph is a depgraph.DependencyGraph; static files are one-to-one
+    # edges in it, so only stale copies are redone. The caller saves it.
+    stats = CopyStats()
+    copies = []
+    live_outputs = set()
+
+    for rel_path, dir_entry in scan_tree(source_directory, static_site_directory):
+        full_path = os.path.join(source_directory, rel_path)
+        static_path = os.path.join(static_site_directory, rel_path)
+        live_outputs.add(static_path)
+        if graph.is_stale(static_path, [full_path], use_hash):
+            copies.append((full_path, static_path))
+        else:
+            stats.skipped += 1
+        graph.record(static_path, [full_path], "static", use_hash)
+
+    # Stale copies whose bytes turn out identical count as skipped too
+    stats.changed = run_copies(copies, jobs, mode, verbose)
+    stats.copied = len(stats.changed)
+    stats.skipped += len(copies) - stats.copied
+
+    # Only prune files we copied ourselves, never other build outputs
+    for static_path in graph.removed_outputs("static", live_outputs):
+        if os.path.exists(static_path):
+            os.remove(static_path)
+            remove_empty_dirs(os.path.dirname(static_path), static_site_directory)
+            stats.removed.append(static_path)
+        stats.pruned += 1
+
+    return stats
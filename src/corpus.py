@@ -0,0 +1,89 @@
+import os
+import random
+
+# Deterministic synthetic markdown for the benchmarks: the same seed
+# always produces byte-identical documents, so timings from different
+# commits are measured against the same input.
+
+WORDS = (
+    "static site generator markdown block inline parser render tree node "
+    "page asset copy build cache graph link image code quote list heading "
+    "paragraph fast slow bytes memory worker chunk stream template output"
+).split()
+
+
+def sentence(rng, words=12):
+    parts = []
+    for _ in range(words):
+        word = rng.choice(WORDS)
+        roll = rng.random()
+        if roll < 0.05:
+            word = f"**{word}**"
+        elif roll < 0.10:
+            word = f"*{word}*"
+        elif roll < 0.13:
+            word = f"`{word}`"
+        elif roll < 0.15:
+            word = f"[{word}](/{rng.choice(WORDS)}.html)"
+        elif roll < 0.16:
+            word = f"![{word}](/images/{rng.choice(WORDS)}.png)"
+        parts.append(word)
+    return " ".join(parts).capitalize() + "."
+
+
+def long_paragraph(rng, sentences=40):
+    return " ".join(sentence(rng) for _ in range(sentences))
+
+
+def link_heavy_paragraph(links=10000):
+    return " ".join(f"see [link {i}](https://example.com/page/{i})" for i in range(links))
+
+
+def long_list(rng, items=200, ordered=False):
+    if ordered:
+        return "\n".join(f"{i}. {sentence(rng, 6)}" for i in range(1, items + 1))
+    return "\n".join(f"* {sentence(rng, 6)}" for _ in range(items))
+
+
+def huge_code_block(rng, lines=2000):
+    body = "\n".join(f"    value_{i} = {rng.choice(WORDS)}({i}) * 2  # `{rng.choice(WORDS)}`" for i in range(lines))
+    return f"```\n{body}\n```"
+
+
+def document(seed=0, sections=200):
+    rng = random.Random(seed)
+    blocks = []
+    for i in range(sections):
+        blocks.append(f"## Section {i}")
+        blocks.append(long_paragraph(rng, rng.randint(2, 8)))
+        roll = rng.random()
+        if roll < 0.3:
+            blocks.append(long_list(rng, rng.randint(3, 30), ordered=rng.random() < 0.5))
+        elif roll < 0.4:
+            blocks.append(huge_code_block(rng, rng.randint(5, 50)))
+        elif roll < 0.5:
+            blocks.append("\n".join(f"> {sentence(rng)}" for _ in range(rng.randint(1, 4))))
+    return "# Generated document\n\n" + "\n\n".join(blocks) + "\n"
+
+
+def paragraph_heavy_document(paragraphs=2000, seed=0):
+    rng = random.Random(seed)
+    return [long_paragraph(rng, 8) for _ in range(paragraphs)]
+
+
+def write_site(directory, pages=500, static_files=500, seed=0):
+    # Many small pages under content/ plus a static/ tree of small assets
+    rng = random.Random(seed)
+    content_directory = os.path.join(directory, "content")
+    static_directory = os.path.join(directory, "static")
+    for i in range(pages):
+        path = os.path.join(content_directory, f"section{i % 10}", f"page{i}.md")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(f"# Page {i}\n\n{long_paragraph(rng, 3)}\n\n{long_list(rng, 5)}\n")
+    for i in range(static_files):
+        path = os.path.join(static_directory, f"dir{i % 20}", f"asset{i}.css")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(f".rule-{i} {{ color: #{rng.randrange(0x1000000):06x}; }}\n" * rng.randint(1, 50))
+    return content_directory, static_directory
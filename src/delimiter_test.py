@@ -1,9 +1,18 @@
+import io
+import os
+import random
+import tempfile
+import tracemalloc
 import unittest
+
+import corpus
 from split_delimiter import (
-    split_nodes_delimiter, extract_markdown_images, extract_markdown_links, text_to_textnodes, markdown_to_blocks, block_to_block_type,
-    markdown_to_html_node
+    split_nodes_delimiter, split_nodes_image, split_nodes_link, extract_markdown_images, extract_markdown_links, text_to_textnodes, markdown_to_blocks, block_to_block_type,
+    markdown_to_html_node, stream_markdown_to_html, block_spans, markdown_file_to_html,
+    BlockType, register_block_type, CUSTOM_BLOCK_MATCHERS, BLOCK_HANDLERS,
+    text_to_children, inline_cache_info, clear_inline_cache, INLINE_CACHE_MAX_LENGTH, render_hook, render_markdown
 )
-from htmlnode import HTMLNode
+from htmlnode import HTMLNode, LeafNode, ParentNode
 from textnode import TextNode, TextType
 
 
@@ -86,6 +95,41 @@ class TestInlineMarkdown(unittest.TestCase):
             ],
             new_nodes,
         )
+    def test_split_images(self):
+        node = TextNode(
+            "This is text with an ![image](https://i.imgur.com/zjjcJKZ.png) and another ![second image](https://i.imgur.com/3elNhQu.png)",
+            TextType.TEXT,
+        )
+        new_nodes = split_nodes_image([node])
+        self.assertListEqual(
+            [
+                TextNode("This is text with an ", TextType.TEXT),
+                TextNode("image", TextType.IMAGE, "https://i.imgur.com/zjjcJKZ.png"),
+                TextNode(" and another ", TextType.TEXT),
+                TextNode("second image", TextType.IMAGE, "https://i.imgur.com/3elNhQu.png"),
+            ],
+            new_nodes,
+        )
+
+    def test_split_links_skips_images(self):
+        node = TextNode("[a](/a) then ![b](/b.png) then [c](/c) end", TextType.TEXT)
+        new_nodes = split_nodes_link([node])
+        self.assertListEqual(
+            [
+                TextNode("a", TextType.LINK, "/a"),
+                TextNode(" then ![b](/b.png) then ", TextType.TEXT),
+                TextNode("c", TextType.LINK, "/c"),
+                TextNode(" end", TextType.TEXT),
+            ],
+            new_nodes,
+        )
+
+    def test_split_links_repeated_target(self):
+        node = TextNode("[x](/x)" + " and [x](/x)" * 9999, TextType.TEXT)
+        new_nodes = split_nodes_link([node])
+        self.assertEqual(len(new_nodes), 19999)
+        self.assertEqual(new_nodes[-1], TextNode("x", TextType.LINK, "/x"))
+
 class TestExtractionRegex(unittest.TestCase):
     def test_extraction_image(self):
         text = ("This is text with a ![rick roll](https://i.imgur.com/aKaOqIh.gif)")
@@ -138,6 +182,95 @@ class TestExtractionRegex(unittest.TestCase):
             ]
         self.assertEqual(result, expected_result)
 
+    def test_text_to_textnodes_code_keeps_asterisks(self):
+        result = text_to_textnodes("Use `a * b` here")
+        self.assertEqual(result, [
+            TextNode("Use ", TextType.TEXT),
+            TextNode("a * b", TextType.CODE),
+            TextNode(" here", TextType.TEXT),
+        ])
+
+    def test_text_to_textnodes_stray_brackets(self):
+        result = text_to_textnodes("A [note] and ![not an image] then [link](/a)")
+        self.assertEqual(result, [
+            TextNode("A [note] and ![not an image] then ", TextType.TEXT),
+            TextNode("link", TextType.LINK, "/a"),
+        ])
+
+    def test_text_to_textnodes_adjacent(self):
+        result = text_to_textnodes("**bold***italic*[x](/y)")
+        self.assertEqual(result, [
+            TextNode("bold", TextType.BOLD),
+            TextNode("italic", TextType.ITALIC),
+            TextNode("x", TextType.LINK, "/y"),
+        ])
+
+    def test_text_to_textnodes_lone_asterisk(self):
+        self.assertEqual(text_to_textnodes("a * b"), [TextNode("a * b", TextType.TEXT)])
+        self.assertEqual(text_to_textnodes("a ** b"), [TextNode("a ** b", TextType.TEXT)])
+        self.assertEqual(
+            text_to_textnodes("a *b* c *"),
+            [TextNode("a ", TextType.TEXT), TextNode("b", TextType.ITALIC), TextNode(" c *", TextType.TEXT)],
+        )
+
+    def test_text_to_textnodes_spaced_delimiters_still_pair(self):
+        # A star that has a closer pairs with it, spaces or not
+        self.assertEqual(
+            text_to_textnodes("a** **a"),
+            [TextNode("a", TextType.TEXT), TextNode(" ", TextType.BOLD), TextNode("a", TextType.TEXT)],
+        )
+        self.assertEqual(text_to_textnodes("** bold**"), [TextNode(" bold", TextType.BOLD)])
+
+    def test_text_to_textnodes_unclosed(self):
+        with self.assertRaises(ValueError):
+            text_to_textnodes("This is **not closed")
+        with self.assertRaises(ValueError):
+            text_to_textnodes("a *b")
+
+class TestInlineCache(unittest.TestCase):
+    def setUp(self):
+        clear_inline_cache()
+
+    def test_repeated_text_hits_cache(self):
+        first = text_to_children("A **repeated** label")
+        second = text_to_children("A **repeated** label")
+        info = inline_cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 1))
+        self.assertEqual([node.to_html() for node in first], ["A ", "<b>repeated</b>", " label"])
+        # Callers get their own lists, so appending to one is harmless
+        self.assertIsNot(first, second)
+        first.append("extra")
+        self.assertEqual(len(text_to_children("A **repeated** label")), 3)
+
+    def test_rendering_repeated_list_items(self):
+        markdown = "\n\n".join(["* Home\n* About\n* Contact"] * 50)
+        html = markdown_to_html_node(markdown).to_html()
+        self.assertEqual(html.count("<li>About</li>"), 50)
+        self.assertEqual(inline_cache_info().misses, 3)
+
+    def test_long_text_is_not_cached(self):
+        paragraph = "word " * INLINE_CACHE_MAX_LENGTH
+        text_to_children(paragraph)
+        text_to_children(paragraph)
+        self.assertEqual(inline_cache_info().currsize, 0)
+
+    def test_streaming_memory_does_not_grow_with_distinct_paragraphs(self):
+        # Every paragraph is distinct and long; none of them may stay
+        # behind in the cache once it has been written
+        rng = random.Random(1)
+        with tempfile.TemporaryDirectory() as temp:
+            source_path = os.path.join(temp, "page.md")
+            with open(source_path, "w") as f:
+                f.write("\n\n".join(corpus.long_paragraph(rng, 10) for _ in range(200)))
+            tracemalloc.start()
+            try:
+                markdown_file_to_html(source_path, os.path.join(temp, "page.html"))
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            self.assertLess(peak, os.path.getsize(source_path) // 2)
+
+
 class TestMarkdownToBlock(unittest.TestCase):  
     def test_markdown_to_block(self):
         markdown = (
@@ -153,6 +286,40 @@ class TestMarkdownToBlock(unittest.TestCase):
         ]
         self.assertEqual(result, expected_result)
 
+    def test_stream_matches_tree_render(self):
+        markdown = "# Title\n\nSome **bold** text\n\n1. one\n2. two\n\n> quoted\n"
+        for source in (markdown, markdown.encode()):
+            stream = io.StringIO()
+            stream_markdown_to_html(source, stream)
+            self.assertEqual(stream.getvalue(), markdown_to_html_node(markdown).to_html())
+
+    def test_block_spans(self):
+        markdown = "  # Heading  \n\n\nline one\nline two  \n"
+        spans = block_spans(markdown)
+        self.assertEqual([(span.start, span.end) for span in spans], [(2, 11), (16, 33)])
+        self.assertEqual(spans[1].lines, ["line one", "line two"])
+        self.assertEqual([span.text for span in block_spans(markdown.encode())], ["# Heading", "line one\nline two"])
+
+    def test_markdown_file_to_html(self):
+        markdown = "# Title\n\n* one\n* two\n\nA paragraph with caf\u00e9 in it\n"
+        with tempfile.TemporaryDirectory() as temp:
+            source_path = os.path.join(temp, "page.md")
+            dest_path = os.path.join(temp, "page.html")
+            with open(source_path, "w", encoding="utf-8") as f:
+                f.write(markdown)
+            markdown_file_to_html(source_path, dest_path)
+            with open(dest_path, encoding="utf-8") as f:
+                self.assertEqual(f.read(), markdown_to_html_node(markdown).to_html())
+
+    def test_markdown_file_to_html_parse_error(self):
+        # The parser's error, not a BufferError from closing the mapped file
+        with tempfile.TemporaryDirectory() as temp:
+            source_path = os.path.join(temp, "page.md")
+            with open(source_path, "w", encoding="utf-8") as f:
+                f.write("# Title\n\nplain **bold\n\nmore\n")
+            with self.assertRaisesRegex(ValueError, "not closed"):
+                markdown_file_to_html(source_path, os.path.join(temp, "page.html"))
+
     def test_block_to_block_type(self):
         # Testing valid types
         heading_block = "# Heading"
@@ -182,6 +349,33 @@ class TestMarkdownToBlock(unittest.TestCase):
         multiline_code = "```\ncode here\ncode there\n```"
         self.assertEqual(block_to_block_type(multiline_code), "code")
 
+    def test_block_type_enum(self):
+        self.assertIs(block_to_block_type("> quote"), BlockType.QUOTE)
+        self.assertIs(block_to_block_type("1. one\n3. three"), BlockType.PARAGRAPH)
+        self.assertIs(block_to_block_type("* one\nnot a bullet"), BlockType.PARAGRAPH)
+        self.assertIs(block_to_block_type("######"), BlockType.PARAGRAPH)
+        self.assertIs(block_to_block_type("####### Seven"), BlockType.PARAGRAPH)
+
+    def test_register_block_type(self):
+        def is_note(block, lines):
+            return all(line.startswith("!!! ") for line in lines)
+
+        def note_block(block, parent=None, lines=None):
+            node = ParentNode("aside", [LeafNode(None, " ".join(line[4:] for line in lines))])
+            if parent is not None:
+                parent.children.append(node)
+            return node
+
+        register_block_type("note", "!!! ", is_note, note_block)
+        try:
+            self.assertEqual(block_to_block_type("!!! careful\n!!! now"), "note")
+            self.assertEqual(block_to_block_type("!! not a note"), BlockType.PARAGRAPH)
+            node = markdown_to_html_node("!!! careful\n!!! now\n\nText")
+            self.assertEqual(node.to_html(), "<div><aside>careful now</aside><p>Text</p></div>")
+        finally:
+            CUSTOM_BLOCK_MATCHERS.pop("!")
+            BLOCK_HANDLERS.pop("note")
+
     def test_block_to_html(self):
         # Test paragraph
         node = markdown_to_html_node("This is a paragraph text.")
@@ -222,8 +416,54 @@ class TestMarkdownToBlock(unittest.TestCase):
         assert len(node.children) == 1
         assert node.children[0].tag == "blockquote"
 
+    def test_unordered_list_items(self):
+        # Only the bullet is stripped; stars inside the item are markup or text
+        self.assertEqual(
+            markdown_to_html_node("* a * b\n* *word* more\n- dash item").to_html(),
+            "<div><ul><li>a * b</li><li><i>word</i> more</li><li>dash item</li></ul></div>",
+        )
+
+    def test_empty_code_block(self):
+        for markdown in ("```\n```", "``````", "```python\n```"):
+            self.assertEqual(markdown_to_html_node(markdown).to_html(), "<div><pre><code></code></pre></div>")
+
+    def test_code_block_is_literal(self):
+        self.assertEqual(
+            markdown_to_html_node("```python\nx = `a` * b **c\n```").to_html(),
+            "<div><pre><code>x = `a` * b **c\n</code></pre></div>",
+        )
+
+    def test_markdown_to_html(self):
+        node = markdown_to_html_node("# Title\n\nA [link](/a) and ![pic](/p.png)")
+        self.assertEqual(
+            node.to_html(),
+            '<div><h1>Title</h1><p>A <a href="/a">link</a> and <img src="/p.png" alt="pic"></p></div>',
+        )
+
+
+class RecordingHook():
+    def __init__(self):
+        self.events = []
+
+    def block(self, span, line):
+        self.events.append(("block", line, span.text))
+
+    def inline(self, text, nodes):
+        self.events.append(("inline", text))
 
 
+class TestRenderHooks(unittest.TestCase):
+    def test_hook_sees_blocks_and_inline_runs(self):
+        with render_hook(RecordingHook()) as hook:
+            render_markdown("# Title\n\n\n* one\n* two\n\n```\ncode\n```")
+        self.assertEqual(hook.events, [
+            ("block", 1, "# Title"), ("inline", "Title"),
+            ("block", 4, "* one\n* two"), ("inline", "one"), ("inline", "two"),
+            ("block", 7, "```\ncode\n```"),
+        ])
+        # Unregistered once the block exits
+        render_markdown("More")
+        self.assertEqual(len(hook.events), 6)
 
 
 if __name__ == "__main__":
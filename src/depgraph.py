@@ -0,0 +1,102 @@
+import json
+import os
+
+from output import file_hash, write_json_atomic
+
+
+class DependencyGraph():
+    # Which inputs (markdown, templates, static files) each output was
+    # built from, plus the size/mtime stamp every input had at that time.
+    # Comparing those stamps with the files on disk gives the minimal set
+    # of outputs a build has to redo.
+    def __init__(self, path):
+        self.path = path
+        self.outputs = {}
+        self.previous_stamps = {}
+        self.stamps = {}
+        self.current_stamps = {}
+
+    def __repr__(self):
+        return f"DependencyGraph({self.path}, outputs: {len(self.outputs)})"
+
+    @classmethod
+    def load(cls, path):
+        graph = cls(path)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            graph.outputs = data["outputs"]
+            graph.previous_stamps = data["stamps"]
+        except (OSError, ValueError, KeyError):
+            # No graph yet, or an unreadable one: everything is stale
+            pass
+        return graph
+
+    def begin(self):
+        # Forget the stamps of the last build attempt: one that raised
+        # never reached save(), and its stat results predate any edits
+        # made since (e.g. fixing a broken page under --watch).
+        self.stamps = {}
+        self.current_stamps = {}
+
+    def save(self):
+        live_inputs = set()
+        for node in self.outputs.values():
+            live_inputs.update(node["inputs"])
+        stamps = {path: stamp for path, stamp in self.stamps.items() if path in live_inputs}
+        for path in live_inputs:
+            if path not in stamps and path in self.previous_stamps:
+                stamps[path] = self.previous_stamps[path]
+        write_json_atomic(self.path, {"outputs": self.outputs, "stamps": stamps})
+        # Ready for the next build in this process, e.g. under --watch
+        self.previous_stamps = stamps
+        self.begin()
+
+    def stamp(self, path, use_hash=False):
+        # Each input is stat'ed at most once per build, however many
+        # outputs depend on it (a template is shared by every page).
+        stamp = self.current_stamps.get(path)
+        if stamp is None:
+            stat = os.stat(path)
+            stamp = {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+            self.current_stamps[path] = stamp
+        if use_hash and "hash" not in stamp:
+            stamp["hash"] = file_hash(path)
+        return stamp
+
+    def input_changed(self, path, use_hash=False):
+        previous = self.previous_stamps.get(path)
+        if previous is None:
+            return True
+        stamp = self.stamp(path)
+        if previous["size"] == stamp["size"] and previous["mtime"] == stamp["mtime"]:
+            if "hash" in previous:
+                stamp.setdefault("hash", previous["hash"])
+            return False
+        # Touched but possibly identical content, e.g. after a fresh checkout
+        if use_hash and previous["size"] == stamp["size"] and "hash" in previous:
+            return self.stamp(path, use_hash=True)["hash"] != previous["hash"]
+        return True
+
+    def is_stale(self, output_path, input_paths, use_hash=False):
+        node = self.outputs.get(output_path)
+        if node is None or node["inputs"] != list(input_paths):
+            return True
+        if not os.path.exists(output_path):
+            return True
+        return any(self.input_changed(path, use_hash) for path in input_paths)
+
+    def record(self, output_path, input_paths, kind, use_hash=False):
+        self.outputs[output_path] = {"kind": kind, "inputs": list(input_paths)}
+        for path in input_paths:
+            self.stamps[path] = self.stamp(path, use_hash)
+
+    def removed_outputs(self, kind, live_outputs):
+        # Outputs of this kind from the last build that nothing produces now
+        removed = [
+            output_path for output_path, node in self.outputs.items()
+            if node["kind"] == kind and output_path not in live_outputs
+        ]
+        for output_path in removed:
+            del self.outputs[output_path]
+        return removed
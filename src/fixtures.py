@@ -0,0 +1,28 @@
+import os
+import tempfile
+import unittest
+
+# Shared by the test modules: helpers for building small trees of files,
+# and a TestCase that gives every test a fresh temporary directory.
+
+
+def write_file(path, content, mtime_offset=0):
+    # mtime_offset (ns) moves the mtime, for tests about stale stamps
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+    if mtime_offset:
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + mtime_offset))
+
+
+def read_file(path):
+    with open(path) as f:
+        return f.read()
+
+
+class TempDirTestCase(unittest.TestCase):
+    # self.temp is a TemporaryDirectory, removed again after each test
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp.cleanup)
@@ -0,0 +1,445 @@
+import collections
+import contextlib
+import io
+import itertools
+import mmap
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+import assets
+import linkcheck
+import profiler
+import search
+from copystatic import scan_tree
+from output import write_if_changed
+from pipeline import DEFAULT_MEMORY_BUDGET, run_pipeline
+from split_delimiter import (
+    RENDER_HOOKS, block_to_html_node, clear_inline_cache, hooked_spans, iter_block_spans, markdown_file_to_html,
+    markdown_to_html_node, page_title, parse_markdown, parse_markdown_file, profiled_blocks_to_html, render_hook,
+    render_markdown, split_front_matter, write_page
+)
+from template import load_template
+
+# Pages at least this big render their blocks across worker processes,
+# CHUNK_BYTES of markdown per task
+PARALLEL_THRESHOLD = 8 * 1024 * 1024
+CHUNK_BYTES = 1024 * 1024
+
+class PageStats():
+    def __init__(self):
+        self.rendered = 0
+        self.skipped = 0
+        self.pruned = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.indexed = 0
+        self.links_collected = 0
+        self.changed = []
+        self.removed = []
+
+    def __repr__(self):
+        return (
+            f"PageStats(rendered: {self.rendered}, skipped: {self.skipped}, pruned: {self.pruned}, "
+            f"cache hits: {self.cache_hits}, cache misses: {self.cache_misses})"
+        )
+
+    def hit_rate(self):
+        lookups = self.cache_hits + self.cache_misses
+        return self.cache_hits / lookups if lookups else 0.0
+
+
+def find_markdown_files(content_directory):
+    return sorted(rel_path for rel_path, dir_entry in scan_tree(content_directory) if rel_path.endswith(".md"))
+
+
+def page_output_path(rel_path, dest_directory):
+    return os.path.join(dest_directory, rel_path[:-len(".md")] + ".html")
+
+
+def page_url(dest_path, dest_directory):
+    return "/" + os.path.relpath(dest_path, dest_directory).replace(os.sep, "/")
+
+
+def page_inputs(page, template_path=None, asset_map_path=None):
+    source_path, dest_path = page
+    return [path for path in (source_path, template_path, asset_map_path) if path is not None]
+
+
+def use_asset_map(asset_map_path=None):
+    # Links render differently under a new map, so inline nodes cached
+    # under the old one are dropped
+    if assets.load_asset_map(asset_map_path):
+        clear_inline_cache()
+
+
+def generate_page(source_path, dest_path, cache=None, template=None, render_file=markdown_file_to_html):
+    # Returns (came out of the render cache, dest_path was rewritten)
+    profile = profiler.PROFILER
+    if profile is None:
+        return build_page(source_path, dest_path, cache, template, render_file)
+    start = time.perf_counter()
+    profile.start_page(source_path)
+    result = build_page(source_path, dest_path, cache, template, render_file)
+    seconds = time.perf_counter() - start
+    bytes_in = os.path.getsize(source_path)
+    bytes_out = os.path.getsize(dest_path)
+    profile.add("page", seconds, bytes_in, bytes_out)
+    profile.finish_page(seconds, bytes_in, bytes_out)
+    return result
+
+
+def build_page(source_path, dest_path, cache=None, template=None, render_file=markdown_file_to_html):
+    os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+    return write_if_changed(dest_path, partial(render_page, source_path, cache=cache, template=template,
+                                               render_file=render_file))
+
+
+def render_page(source_path, dest_path, cache=None, template=None, render_file=markdown_file_to_html):
+    if cache is not None:
+        key = cache.key(source_path, template.source if template is not None else "", assets.ASSET_MAP_DIGEST)
+        if cache.fetch(key, dest_path):
+            return True
+    render_file(source_path, dest_path, template)
+    if cache is not None:
+        cache.store(key, dest_path)
+    return False
+
+
+@contextlib.contextmanager
+def collectors(index=False, check_links=False):
+    # Search terms and link targets are gathered from the inline nodes the
+    # render builds anyway; each collector is only active when asked for
+    with contextlib.ExitStack() as stack:
+        fragments = stack.enter_context(search.collecting()) if index else None
+        page_links = stack.enter_context(linkcheck.collecting()) if check_links else None
+        yield fragments, page_links
+
+
+def collected(fragments, page_links):
+    terms = search.page_terms(fragments) if fragments is not None else None
+    links = page_links.links if page_links is not None else None
+    return terms, links
+
+
+def collect_page(source_path, index=False, check_links=False):
+    # For pages whose collectors are out of date but whose HTML is not
+    with collectors(index, check_links) as (fragments, page_links):
+        parse_markdown_file(source_path)
+    return collected(fragments, page_links)
+
+
+def generate_page_job(page, index=False, check_links=False, cache=None, template_path=None,
+                      render_file=markdown_file_to_html):
+    # Workers get the template path; load_template parses it once per process.
+    # Returns (cache hit, output changed, search terms, link targets), the
+    # last two None unless requested.
+    source_path, dest_path = page
+    template = load_template(template_path, assets.ASSET_MAP) if template_path is not None else None
+    if not (index or check_links):
+        return generate_page(source_path, dest_path, cache, template, render_file) + (None, None)
+    with collectors(index, check_links) as (fragments, page_links):
+        cache_hit, changed = generate_page(source_path, dest_path, cache, template, render_file)
+    if cache_hit:
+        # Nothing was parsed, but the source changed since it was collected
+        return (cache_hit, changed) + collect_page(source_path, index, check_links)
+    return (cache_hit, changed) + collected(fragments, page_links)
+
+
+def render_source_job(source_path, data, render=True, index=False, check_links=False, template_path=None,
+                      drain=False):
+    # The --pipeline render stage: source bytes in, HTML out, no file I/O.
+    # With --profile the render's stages count towards source_path's page;
+    # a worker process (drain) sends its numbers back with the result, and
+    # the pipeline adds the page's seconds as it finishes each stage.
+    profile = profiler.PROFILER
+    if profile is not None:
+        profile.start_page(source_path)
+    with collectors(index, check_links) as (fragments, page_links):
+        if render:
+            template = load_template(template_path, assets.ASSET_MAP) if template_path is not None else None
+            html = render_markdown(data, template)
+        else:
+            html = None
+            parse_markdown(data)
+    profile_data = None
+    if profile is not None:
+        profile.finish_page(0.0, 0, 0)
+        if drain:
+            profile_data = profile.drain()
+    return (html,) + collected(fragments, page_links) + (profile_data,)
+
+
+def pipeline_pages(tasks, jobs, cache=None, template_path=None, asset_map_path=None,
+                   memory_budget=DEFAULT_MEMORY_BUDGET):
+    template_source = load_template(template_path).source if template_path is not None else ""
+    render = partial(render_source_job, template_path=template_path)
+    use_asset_map(asset_map_path)
+    if jobs == 1:
+        # Rendering still overlaps with reads and writes, on one thread
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return run_pipeline(tasks, render, executor, 1, cache, template_source, assets.ASSET_MAP_DIGEST,
+                                memory_budget)
+    profile = profiler.PROFILER is not None
+    render = partial(render, drain=profile)
+    with ProcessPoolExecutor(max_workers=jobs, initializer=warm_worker, initargs=(profile, asset_map_path)) as executor:
+        return run_pipeline(tasks, render, executor, jobs, cache, template_source, assets.ASSET_MAP_DIGEST,
+                            memory_budget)
+
+
+def markdown_file_to_html_parallel(source_path, dest_path, template=None, executor=None, chunk_bytes=CHUNK_BYTES,
+                                   in_flight=None):
+    # For single huge pages: blocks render independently, so runs of them
+    # go to executor's worker processes as byte ranges of the file, and
+    # the HTML fragments come back and are written in order. Workers map
+    # the file themselves; only offsets and HTML cross the process boundary.
+    # At most in_flight chunks (default two per CPU) are queued at a time.
+    if in_flight is None:
+        in_flight = (os.cpu_count() or 1) * 2
+    hooks = list(RENDER_HOOKS)
+    with open(source_path, "rb") as source:
+        with open(dest_path, "w", encoding="utf-8") as dest:
+            if os.fstat(source.fileno()).st_size == 0:
+                write_page(dest, [], template)
+                return
+            with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                source_spans = iter_block_spans(buffer)
+                try:
+                    spans, front_matter = split_front_matter(source_spans)
+                    title = ""
+                    if template is not None:
+                        title, leading = page_title(spans)
+                        spans = itertools.chain(leading, spans)
+                    chunks = list(chunk_spans(buffer, spans, chunk_bytes))
+                finally:
+                    source_spans.close()
+
+                def write_content(stream):
+                    stream.write("<div>")
+                    results = bounded_map(
+                        executor, render_chunk, in_flight, itertools.repeat(source_path), *zip(*chunks),
+                        itertools.repeat([hook.fork() for hook in hooks]),
+                    ) if chunks else []
+                    for html, worker_hooks, profile_data in results:
+                        stream.write(html)
+                        for hook, worker_hook in zip(hooks, worker_hooks):
+                            hook.merge(worker_hook)
+                        if profile_data is not None and profiler.PROFILER is not None:
+                            profiler.PROFILER.merge(profile_data)
+                    stream.write("</div>")
+
+                if template is None:
+                    write_content(dest)
+                else:
+                    template.render_to(dest, front_matter.get("title", title), write_content)
+
+
+def bounded_map(executor, func, limit, *iterables):
+    # executor.map submits every task up front; this keeps at most limit
+    # queued, so results are consumed in order as the next are submitted
+    pending = collections.deque()
+    try:
+        for args in zip(*iterables):
+            if len(pending) >= limit:
+                yield pending.popleft().result()
+            pending.append(executor.submit(func, *args))
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def chunk_spans(buffer, spans, chunk_bytes):
+    # Yields (start, end, line) for runs of about chunk_bytes of blocks;
+    # start is the beginning of the first block's line, line its number
+    start = None
+    end = 0
+    line = 1
+    counted = 0
+    for span in spans:
+        if start is None:
+            start = buffer.rfind(b"\n", 0, span.start) + 1
+        end = span.end
+        if end - start >= chunk_bytes:
+            line += buffer[counted:start].count(b"\n")
+            counted = start
+            yield start, end, line
+            start = None
+    if start is not None:
+        line += buffer[counted:start].count(b"\n")
+        yield start, end, line
+
+
+def render_chunk(source_path, start, end, line, hooks=()):
+    # Runs in a worker: renders the blocks in [start, end) of the file,
+    # with hooks, the parent's hooks forked, active; returns the HTML, the
+    # hooks and, when the worker profiles, its numbers for the parent
+    with open(source_path, "rb") as source:
+        with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            with contextlib.ExitStack() as stack:
+                for hook in hooks:
+                    stack.enter_context(render_hook(hook))
+                source_spans = iter_block_spans(buffer, start, end)
+                spans = hooked_spans(source_spans, line, start) if hooks else source_spans
+                stream = io.StringIO()
+                profile = profiler.PROFILER
+                try:
+                    if profile is None:
+                        for span in spans:
+                            block_to_html_node(span.text, None, span.lines).render_to(stream)
+                    else:
+                        profiled_blocks_to_html(spans, stream, profile)
+                finally:
+                    source_spans.close()
+    return stream.getvalue(), hooks, profile.drain() if profile is not None else None
+
+
+def generate_huge_pages(tasks, jobs, cache=None, template_path=None, asset_map_path=None, chunk_bytes=CHUNK_BYTES):
+    # One page at a time in this process, each spread block-wise over a
+    # shared pool; page-level workers could not start pools of their own.
+    # With --profile, workers time their chunks and the numbers are merged
+    # into the page generate_page records here.
+    use_asset_map(asset_map_path)
+    profile = profiler.PROFILER is not None
+    with ProcessPoolExecutor(max_workers=jobs, initializer=warm_worker, initargs=(profile, asset_map_path)) as executor:
+        render_file = partial(markdown_file_to_html_parallel, executor=executor, chunk_bytes=chunk_bytes,
+                              in_flight=jobs * 2)
+        return [
+            generate_page_job(page, index, check_links, cache, template_path, render_file)
+            for page, index, check_links in tasks
+        ]
+
+
+def profiled_page_job(page, index=False, check_links=False, cache=None, template_path=None):
+    # Worker-side numbers travel back with the result for the parent to merge
+    return generate_page_job(page, index, check_links, cache, template_path), profiler.PROFILER.drain()
+
+
+def warm_worker(profile=False, asset_map_path=None):
+    # Runs once per worker process, which has already imported this module
+    # and the render pipeline; one tiny render warms the remaining lazy
+    # state so the first real page in each worker is not the slow one.
+    profiler.disable()
+    use_asset_map(asset_map_path)
+    markdown_to_html_node("# Warm\n\n**up** *the* `pipeline` [a](b) ![c](d)\n\n* list\n\n1. list").to_html()
+    if profile:
+        profiler.enable()
+
+
+def chunk_size(page_count, jobs):
+    # Around four chunks per worker keeps IPC low while still balancing
+    # uneven page sizes across workers.
+    return max(1, page_count // (jobs * 4))
+
+
+def generate_pages(content_directory, dest_directory, jobs=None, cache=None, graph=None, template_path=None,
+                   asset_map_path=None, search_index=None, link_checker=None, pipeline=False,
+                   memory_budget=DEFAULT_MEMORY_BUDGET, parallel_threshold=PARALLEL_THRESHOLD):
+    if jobs is None or jobs < 1:
+        jobs = os.cpu_count() or 1
+    stats = PageStats()
+    pages = [
+        (os.path.join(content_directory, rel_path), page_output_path(rel_path, dest_directory))
+        for rel_path in find_markdown_files(content_directory)
+    ]
+    stale_pages = pages
+    if graph is not None:
+        live_outputs = set(dest_path for source_path, dest_path in pages)
+        for dest_path in graph.removed_outputs("page", live_outputs):
+            if os.path.exists(dest_path):
+                os.remove(dest_path)
+                stats.removed.append(dest_path)
+            stats.pruned += 1
+        stale_pages = [page for page in pages if graph.is_stale(page[1], page_inputs(page, template_path, asset_map_path))]
+        stats.skipped = len(pages) - len(stale_pages)
+
+    # Pages are re-indexed and their links re-collected only when their
+    # source changed since the last time; stale ones are collected while
+    # they render, the rest without rendering.
+    urls = {page: page_url(page[1], dest_directory) for page in pages}
+    index_flags = [False] * len(stale_pages)
+    check_flags = [False] * len(stale_pages)
+    if search_index is not None:
+        search_index.prune(set(urls.values()))
+        index_flags = [search_index.is_stale(urls[page], page[0]) for page in stale_pages]
+    if link_checker is not None:
+        link_checker.prune(set(source_path for source_path, dest_path in pages))
+        check_flags = [link_checker.is_stale(page[0]) for page in stale_pages]
+    collect_only = []
+    if search_index is not None or link_checker is not None:
+        stale_set = set(stale_pages)
+        for page in pages:
+            if page in stale_set:
+                continue
+            index = search_index is not None and search_index.is_stale(urls[page], page[0])
+            check_links = link_checker is not None and link_checker.is_stale(page[0])
+            if index or check_links:
+                collect_only.append((page, index, check_links))
+
+    # Pages past the threshold are rendered block by block across workers
+    # instead of whole by one; the rest go through the page-level paths
+    huge_tasks = []
+    if jobs > 1 and parallel_threshold:
+        tasks = list(zip(stale_pages, index_flags, check_flags))
+        huge_tasks = [task for task in tasks if os.path.getsize(task[0][0]) >= parallel_threshold]
+    if huge_tasks:
+        huge_results = dict(zip((task[0] for task in huge_tasks), generate_huge_pages(
+            huge_tasks, jobs, cache, template_path, asset_map_path
+        )))
+        all_pages = stale_pages
+        stale_pages, index_flags, check_flags = [], [], []
+        for page, index, check_links in tasks:
+            if page not in huge_results:
+                stale_pages.append(page)
+                index_flags.append(index)
+                check_flags.append(check_links)
+
+    job = partial(generate_page_job, cache=cache, template_path=template_path)
+    if pipeline:
+        tasks = list(zip(stale_pages, index_flags, check_flags))
+        results = pipeline_pages(tasks, min(jobs, max(len(stale_pages), 1)), cache, template_path, asset_map_path,
+                                 memory_budget)
+    elif jobs == 1 or len(stale_pages) < 2:
+        use_asset_map(asset_map_path)
+        results = [job(page, index, check) for page, index, check in zip(stale_pages, index_flags, check_flags)]
+    else:
+        profile = profiler.PROFILER
+        if profile is not None:
+            job = partial(profiled_page_job, cache=cache, template_path=template_path)
+        with ProcessPoolExecutor(max_workers=min(jobs, len(stale_pages)), initializer=warm_worker,
+                                 initargs=(profile is not None, asset_map_path)) as executor:
+            results = list(executor.map(job, stale_pages, index_flags, check_flags, chunksize=chunk_size(len(stale_pages), jobs)))
+        if profile is not None:
+            for result, data in results:
+                profile.merge(data)
+            results = [result for result, data in results]
+
+    if huge_tasks:
+        page_results = dict(zip(stale_pages, results))
+        page_results.update(huge_results)
+        stale_pages = all_pages
+        results = [page_results[page] for page in stale_pages]
+
+    if graph is not None:
+        for page in pages:
+            graph.record(page[1], page_inputs(page, template_path, asset_map_path), "page")
+
+    collected_pages = [(page, terms, links) for page, (cache_hit, changed, terms, links) in zip(stale_pages, results)]
+    for page, index, check_links in collect_only:
+        collected_pages.append((page,) + collect_page(page[0], index, check_links))
+    for page, terms, links in collected_pages:
+        if terms is not None:
+            search_index.update(urls[page], page[0], terms)
+            stats.indexed += 1
+        if links is not None:
+            link_checker.update(page[0], urls[page], links)
+            stats.links_collected += 1
+
+    stats.rendered = len(stale_pages)
+    stats.changed = [page[1] for page, (cache_hit, changed, terms, links) in zip(stale_pages, results) if changed]
+    if cache is not None:
+        stats.cache_hits = sum(result[0] for result in results)
+        stats.cache_misses = len(stale_pages) - stats.cache_hits
+    return stats
@@ -1,7 +1,12 @@
+from types import MappingProxyType
 
+# Shared, read-only props for the many leaves that have none
+EMPTY_PROPS = MappingProxyType({})
 
 
 class HTMLNode():
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag=None, value=None, children=None, props=None):
         self.tag = tag
         self.value = value
@@ -12,10 +17,18 @@ class HTMLNode():
         return (f"{self.__class__.__name__}({self.tag}, {self.value}, children: {self.children}, {self.props})")
     
     def to_html(self):
+        return "".join(self.iter_html())
+
+    def iter_html(self):
         raise NotImplementedError
+
+    def render_to(self, stream):
+        write = stream.write
+        for chunk in self.iter_html():
+            write(chunk)
     
     def props_to_html(self):
-        if self.props == None:
+        if not self.props:
             return ""
         format_list = []
         for key, value in self.props.items():
@@ -23,11 +36,18 @@ class HTMLNode():
         return "".join(format_list)
     
     
+VOID_TAGS = frozenset(["img", "br", "hr"])
+
+
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, value, props=None):
-        super().__init__(tag, value, props)
+        super().__init__(tag, value, None, props)
     
     def to_html(self):
+        if self.tag in VOID_TAGS:
+            return f"<{self.tag}{self.props_to_html()}>"
         if self.value == "" or self.value == None:
             raise ValueError("requires a value")
         if self.tag is None:
@@ -35,20 +55,35 @@ class LeafNode(HTMLNode):
         else:
             props_str = self.props_to_html()  # Don't pass self.props as an argument
             return f"<{self.tag}{props_str}>{self.value}</{self.tag}>"
-        
+
+    def iter_html(self):
+        yield self.to_html()
+
+
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children, props=None):
         super().__init__(tag, None, children, props)
 
-    def to_html(self):
-        if self.tag is None:
-            raise ValueError("invalid HTML: no tag")
-        if self.children is None:
-            raise ValueError("invalid HTML: no children")
-        children_html = ""
-        for child in self.children:
-            children_html += child.to_html()
-        return f"<{self.tag}{self.props_to_html()}>{children_html}</{self.tag}>"
+    def iter_html(self):
+        # Depth-first walk on an explicit stack: deep trees cannot hit the
+        # recursion limit, and closing tags ride the stack as plain strings.
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                yield node
+            elif isinstance(node, ParentNode):
+                if node.tag is None:
+                    raise ValueError("invalid HTML: no tag")
+                if node.children is None:
+                    raise ValueError("invalid HTML: no children")
+                yield f"<{node.tag}{node.props_to_html()}>"
+                stack.append(f"</{node.tag}>")
+                stack.extend(reversed(node.children))
+            else:
+                yield node.to_html()
 
     def __repr__(self):
         return f"ParentNode({self.tag}, children: {self.children}, {self.props})"
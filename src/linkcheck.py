@@ -0,0 +1,136 @@
+import contextlib
+import json
+import posixpath
+from urllib.parse import unquote, urlsplit
+
+import assets
+from output import source_stamp, write_json_atomic
+from split_delimiter import render_hook
+
+
+class PageLinks():
+    # Render hook: the render hands it each block with its source line,
+    # then the link and image nodes of every inline run in the block
+    def __init__(self):
+        self.links = []
+        self.block_text = None
+        self.line = 1
+        self.cursor = 0
+
+    def __repr__(self):
+        return f"PageLinks(links: {len(self.links)})"
+
+    def block(self, span, line):
+        self.block_text = span.text
+        self.line = line
+        self.cursor = 0
+
+    def inline(self, text, children):
+        for node in children:
+            if node.tag == "a":
+                target = node.props["href"]
+            elif node.tag == "img":
+                target = node.props["src"]
+            else:
+                continue
+            # Stored as written, so fingerprints changing never re-break it
+            target = assets.ORIGINAL_URLS.get(target, target)
+            self.links.append([target, self.link_line(target)])
+
+    def link_line(self, target):
+        # The inline text may be a list item or a quote with its markers
+        # stripped, so the link's own markup is looked up in the raw block,
+        # after the previous link's, and its line counted from there
+        if self.block_text is None:
+            return self.line
+        block = self.block_text
+        position = block.find(f"]({target})", self.cursor)
+        if position == -1:
+            position = self.cursor
+        else:
+            self.cursor = position + 1
+        return self.line + block.count("\n", 0, position)
+
+    def fork(self):
+        return PageLinks()
+
+    def merge(self, other):
+        self.links.extend(other.links)
+
+
+@contextlib.contextmanager
+def collecting():
+    with render_hook(PageLinks()) as page_links:
+        yield page_links
+
+
+def resolve_target(target, page_url):
+    # The site path a link points at, or None for external links and
+    # same-page anchors
+    parts = urlsplit(target)
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+    path = unquote(parts.path)
+    if not path.startswith("/"):
+        path = posixpath.join(posixpath.dirname(page_url), path)
+    resolved = posixpath.normpath(path)
+    if path.endswith("/") and resolved != "/":
+        resolved += "/"
+    return resolved
+
+
+def target_exists(path, site_paths):
+    if path in site_paths:
+        return True
+    return path.rstrip("/") + "/index.html" in site_paths
+
+
+class LinkChecker():
+    # Link targets per page, with the source (size, mtime) they were
+    # collected at. Only changed pages are re-parsed; every stored link is
+    # checked against the current set of site paths each build, since a
+    # removed page can break links in pages that did not change.
+    def __init__(self, path):
+        self.path = path
+        self.pages = {}
+
+    def __repr__(self):
+        return f"LinkChecker({self.path}, pages: {len(self.pages)})"
+
+    @classmethod
+    def load(cls, path):
+        checker = cls(path)
+        try:
+            with open(path) as f:
+                checker.pages = json.load(f)
+        except (OSError, ValueError):
+            pass
+        return checker
+
+    def save(self):
+        write_json_atomic(self.path, self.pages)
+
+    def is_stale(self, source_path):
+        page = self.pages.get(source_path)
+        return page is None or page["stamp"] != source_stamp(source_path)
+
+    def update(self, source_path, page_url, links):
+        self.pages[source_path] = {"stamp": source_stamp(source_path), "url": page_url, "links": links}
+
+    def prune(self, live_sources):
+        for source_path in [path for path in self.pages if path not in live_sources]:
+            del self.pages[source_path]
+
+    def broken_links(self, static_paths):
+        # [(source path, line, target)] sorted by file and line. Every
+        # page is in self.pages, so with the static paths that is the
+        # whole generated site.
+        site_paths = set(static_paths)
+        site_paths.update(page["url"] for page in self.pages.values())
+        broken = []
+        for source_path, page in self.pages.items():
+            for target, line in page["links"]:
+                path = resolve_target(target, page["url"])
+                if path is not None and not target_exists(path, site_paths):
+                    broken.append((source_path, line, target))
+        return sorted(broken)
@@ -1,33 +1,227 @@
 from textnode import TextNode, TextType
+from assets import HashCache, build_assets, read_asset_map, write_asset_map
+from metadata import MetadataCache
+from sitemap import site_pages, write_site_files
+from copystatic import COPY_MODES, recursive_copier, scan_tree, sync_static
+from depgraph import DependencyGraph
+from generate_page import PARALLEL_THRESHOLD, generate_pages
+from pipeline import DEFAULT_MEMORY_BUDGET
+from output import write_manifest
+from precompress import DEFAULT_MIN_BYTES, precompress
+from render_cache import DEFAULT_MAX_BYTES, RenderCache
+from linkcheck import LinkChecker
+from search import SearchIndex
+from watch import serve, watch
+import argparse
 import os
-import shutil
+import profiler
 
-def recursive_copier(source_directory, static_site_directory):
-    items = os.listdir(source_directory)
+STATIC_DIRECTORY = "./static"
+CONTENT_DIRECTORY = "./content"
+PUBLIC_DIRECTORY = "./public"
+TEMPLATE_PATH = "./template.html"
+CACHE_DIRECTORY = "./.cache"
+DEPENDENCY_GRAPH = os.path.join(CACHE_DIRECTORY, "depgraph.json")
+RENDER_CACHE_DIRECTORY = os.path.join(CACHE_DIRECTORY, "render")
+CHANGES_MANIFEST = os.path.join(CACHE_DIRECTORY, "changes.json")
+ASSET_MAP = os.path.join(CACHE_DIRECTORY, "asset-map.json")
+ASSET_HASHES = os.path.join(CACHE_DIRECTORY, "asset-hashes.json")
+SEARCH_INDEX = os.path.join(CACHE_DIRECTORY, "search-index.json")
+LINK_CHECK = os.path.join(CACHE_DIRECTORY, "links.json")
+METADATA_CACHE = os.path.join(CACHE_DIRECTORY, "metadata.json")
+CONTENT_HASHES = os.path.join(CACHE_DIRECTORY, "content-hashes.json")
+PRECOMPRESS_STATE = os.path.join(CACHE_DIRECTORY, "precompress.json")
 
-    if not os.path.exists(static_site_directory):
-        os.mkdir(static_site_directory)
 
-    for item in items:
-        full_path = os.path.join(source_directory, item)
-        static_path = os.path.join(static_site_directory, item)
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build the static site into public/")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only rebuild outputs whose inputs changed since the last build")
+    parser.add_argument("--hash", action="store_true",
+                        help="with --incremental, compare file contents when mtimes differ")
+    parser.add_argument("--content", default=CONTENT_DIRECTORY,
+                        help="directory of markdown pages to render (default: ./content)")
+    parser.add_argument("--template", default=TEMPLATE_PATH,
+                        help="page template with {{ Title }} and {{ Content }} slots (default: ./template.html)")
+    parser.add_argument("--jobs", "-j", type=int, default=None,
+                        help="number of parallel workers (default: one per CPU)")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="overlap page reads, rendering and writes in an asyncio pipeline")
+    parser.add_argument("--memory-budget", type=int, default=DEFAULT_MEMORY_BUDGET // (1024 * 1024), metavar="MB",
+                        help="with --pipeline, cap on memory held by in-flight pages (default: %(default)s)")
+    parser.add_argument("--parallel-threshold", type=int, default=PARALLEL_THRESHOLD // (1024 * 1024), metavar="MB",
+                        help="split pages at least this large across all workers, 0 to never (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="render every page without reading or writing the render cache")
+    parser.add_argument("--clear-cache", action="store_true",
+                        help="empty the render cache before building")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="render cache size limit in MB (default: %(default)s)")
+    parser.add_argument("--watch", action="store_true",
+                        help="rebuild incrementally on changes and serve public/ locally")
+    parser.add_argument("--port", type=int, default=8888,
+                        help="port for the --watch preview server (default: %(default)s)")
+    parser.add_argument("--profile", nargs="?", const="profile.json", default=None, metavar="PATH",
+                        help="time every build stage and write a JSON report (default: profile.json)")
+    parser.add_argument("--profile-top", type=int, default=10, metavar="N",
+                        help="number of slowest pages listed with --profile (default: %(default)s)")
+    parser.add_argument("--fingerprint", action="store_true",
+                        help="publish static files under content-hashed names and rewrite page references")
+    parser.add_argument("--copy-mode", choices=COPY_MODES, default="copy",
+                        help="how static files reach public/: copy bytes, hardlink or reflink")
+    parser.add_argument("--search", action="store_true",
+                        help="write a sharded full-text search index to public/search/")
+    parser.add_argument("--check-links", action="store_true",
+                        help="report internal links and images that point at nothing in the built site")
+    parser.add_argument("--site-url", metavar="URL",
+                        help="absolute site URL; writes sitemap.xml and an Atom feed.xml to public/")
+    parser.add_argument("--feed-title", default="Recent pages",
+                        help="title of the Atom feed (default: %(default)s)")
+    parser.add_argument("--feed-author", metavar="NAME",
+                        help="author named by the Atom feed (default: the feed title)")
+    parser.add_argument("--precompress", action="store_true",
+                        help="write a .gz sibling next to every text output for gzip_static")
+    parser.add_argument("--precompress-min-bytes", type=int, default=DEFAULT_MIN_BYTES, metavar="BYTES",
+                        help="leave outputs smaller than this uncompressed (default: %(default)s)")
+    parser.add_argument("--manifest", default=CHANGES_MANIFEST, metavar="PATH",
+                        help="where to list the outputs this build changed or removed (default: %(default)s)")
+    parser.add_argument("--verbose", "-v", action="store_true",
+                        help="list every copied file")
+    return parser.parse_args(argv)
 
-        if os.path.isfile(full_path):
-            print(f"Copying file: {full_path} -> {static_path}")
-            shutil.copy(full_path, static_path)
-        
-        elif os.path.isdir(full_path):
-            print(f"Creating Directory: {static_path}")
-            if not os.path.exists(static_path):
-                os.mkdir(static_path)
-            recursive_copier(full_path, static_path)
-            
-def main():
-    source_directory = "/home/tjm/static-site-generator/static"
-    static_site_directory = "/home/tjm/static-site-generator/public"
 
-    recursive_copier(source_directory, static_site_directory)
+def build(args, cache=None, graph=None):
+    source_directory = STATIC_DIRECTORY
+    static_site_directory = PUBLIC_DIRECTORY
+    if graph is not None:
+        graph.begin()
 
+    asset_map_path = None
+    with profiler.timed_stage("copy_static"):
+        if args.fingerprint:
+            hash_cache = HashCache.load(ASSET_HASHES)
+            asset_map, stats = build_assets(source_directory, static_site_directory, hash_cache,
+                                            read_asset_map(ASSET_MAP), jobs=args.jobs, mode=args.copy_mode,
+                                            verbose=args.verbose)
+            write_asset_map(ASSET_MAP, asset_map)
+            hash_cache.save()
+            asset_map_path = ASSET_MAP
+            static_paths = set(asset_map)
+        elif graph is not None:
+            stats = sync_static(source_directory, static_site_directory, graph, use_hash=args.hash,
+                                jobs=args.jobs, mode=args.copy_mode, verbose=args.verbose)
+        else:
+            stats = recursive_copier(source_directory, static_site_directory,
+                                     jobs=args.jobs, mode=args.copy_mode, verbose=args.verbose)
+        if not args.fingerprint and args.check_links:
+            static_paths = set("/" + rel_path for rel_path, dir_entry in scan_tree(source_directory))
+    summary = f"Static files: {stats.copied} copied, {stats.skipped} skipped, {stats.pruned} pruned"
+    if args.fingerprint:
+        summary += f", {stats.deduplicated} duplicates linked"
+    print(summary)
+    changed = list(stats.changed)
+    removed = list(stats.removed)
 
+    if os.path.isdir(args.content):
+        # Without a template file pages are written as the bare content div
+        template_path = args.template if os.path.isfile(args.template) else None
+        search_index = SearchIndex.load(SEARCH_INDEX) if args.search else None
+        link_checker = LinkChecker.load(LINK_CHECK) if args.check_links else None
+        with profiler.timed_stage("generate_pages"):
+            page_stats = generate_pages(args.content, static_site_directory, jobs=args.jobs, cache=cache,
+                                        graph=graph, template_path=template_path, asset_map_path=asset_map_path,
+                                        search_index=search_index, link_checker=link_checker,
+                                        pipeline=args.pipeline, memory_budget=args.memory_budget * 1024 * 1024,
+                                        parallel_threshold=args.parallel_threshold * 1024 * 1024)
+        summary = f"Pages: {page_stats.rendered} built"
+        if graph is not None:
+            summary += f", {page_stats.skipped} up to date, {page_stats.pruned} removed"
+        if cache is not None:
+            cache.evict()
+            summary += f", cache hit rate {page_stats.hit_rate():.0%} ({page_stats.cache_hits} hits, {page_stats.cache_misses} misses)"
+        print(summary)
+        changed.extend(page_stats.changed)
+        removed.extend(page_stats.removed)
 
-main()
+        if search_index is not None:
+            with profiler.timed_stage("search_index"):
+                shards_changed, shards_removed = search_index.write_shards(static_site_directory)
+                search_index.save()
+            print(f"Search index: {page_stats.indexed} pages indexed, {len(shards_changed)} shards written")
+            changed.extend(shards_changed)
+            removed.extend(shards_removed)
+
+        if link_checker is not None:
+            with profiler.timed_stage("check_links"):
+                broken = link_checker.broken_links(static_paths)
+                link_checker.save()
+            for source_path, line, target in broken:
+                print(f"{source_path}:{line}: broken link {target}")
+            print(f"Links: {len(broken)} broken, {page_stats.links_collected} pages re-read")
+
+        if args.site_url:
+            with profiler.timed_stage("sitemap"):
+                metadata_cache = MetadataCache.load(METADATA_CACHE, HashCache.load(CONTENT_HASHES))
+                pages = site_pages(args.content, static_site_directory, metadata_cache)
+                changed.extend(write_site_files(pages, static_site_directory, args.site_url, args.feed_title,
+                                                 args.feed_author))
+                metadata_cache.save()
+            print(f"Sitemap and feed: {len(pages)} pages, {metadata_cache.extracted} read for metadata")
+
+    if args.precompress:
+        with profiler.timed_stage("precompress"):
+            compress_stats = precompress(static_site_directory, jobs=args.jobs, min_bytes=args.precompress_min_bytes,
+                                         state_path=PRECOMPRESS_STATE)
+        print(
+            f"Precompressed: {compress_stats.compressed} compressed, {compress_stats.skipped} up to date, "
+            f"{compress_stats.too_small} too small, {compress_stats.bytes_saved()} bytes saved"
+        )
+        changed.extend(compress_stats.changed)
+        removed.extend(compress_stats.removed)
+
+    write_manifest(args.manifest, static_site_directory, changed, removed)
+    print(f"Outputs: {len(changed)} changed, {len(removed)} removed (listed in {args.manifest})")
+
+    if graph is not None:
+        graph.save()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    cache = None
+    if not args.no_cache:
+        cache = RenderCache(RENDER_CACHE_DIRECTORY, args.cache_size * 1024 * 1024)
+    if args.clear_cache:
+        RenderCache(RENDER_CACHE_DIRECTORY).clear()
+
+    graph = None
+    if args.incremental or args.watch:
+        graph = DependencyGraph.load(DEPENDENCY_GRAPH)
+
+    if args.profile:
+        profile = profiler.enable()
+        with profiler.timed_stage("build"):
+            build(args, cache, graph)
+        profile.write(args.profile)
+        print(profile.format_table(args.profile_top))
+        print(f"Profile written to {args.profile}")
+        profiler.disable()
+    else:
+        build(args, cache, graph)
+
+    if args.watch:
+        # Same process, same graph and cache: every rebuild after the first
+        # is incremental and starts with everything already imported.
+        server = serve(PUBLIC_DIRECTORY, args.port)
+        print(f"Serving {PUBLIC_DIRECTORY} at http://127.0.0.1:{args.port}/ (Ctrl+C to stop)")
+        try:
+            watch([STATIC_DIRECTORY, args.content, args.template], lambda changed: build(args, cache, graph))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
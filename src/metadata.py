@@ -0,0 +1,98 @@
+import json
+import mmap
+import os
+
+from output import write_json_atomic
+from split_delimiter import (
+    TITLE_LOOKAHEAD, BlockType, block_to_block_type, h1_text, inline_nodes, is_front_matter, iter_block_spans,
+    parse_front_matter
+)
+
+# Part of every cache key; bump when extract_metadata's output changes
+METADATA_VERSION = "3"
+
+
+def plain_text(markdown):
+    return "".join(node.value for node in inline_nodes(markdown)).replace("\n", " ")
+
+
+def extract_metadata(source):
+    # The title is found by the same rule as the page's <title>: the first
+    # h1 among the first TITLE_LOOKAHEAD blocks. The heading is the first
+    # heading of any level. Reads blocks only until it has those and the
+    # first paragraph; the rest of the page is never split or parsed.
+    front_matter = {}
+    title = None
+    heading = None
+    summary = None
+    blocks = 0
+    for position, span in enumerate(iter_block_spans(source)):
+        lines = span.lines
+        if position == 0 and is_front_matter(lines):
+            front_matter = parse_front_matter(lines)
+            continue
+        blocks += 1
+        block_type = block_to_block_type(span.text, lines)
+        if title is None and blocks <= TITLE_LOOKAHEAD:
+            title = h1_text(span.text)
+        if heading is None and block_type == BlockType.HEADING:
+            heading = plain_text(span.text.lstrip("#").strip())
+        if summary is None and block_type == BlockType.PARAGRAPH:
+            summary = plain_text(span.text)
+        if summary is not None and heading is not None and (title is not None or blocks >= TITLE_LOOKAHEAD):
+            break
+    return {
+        "title": front_matter.get("title", title or ""),
+        "heading": heading or "",
+        "summary": front_matter.get("summary", front_matter.get("description", summary or "")),
+        "date": front_matter.get("date", ""),
+        "front_matter": front_matter,
+    }
+
+
+def extract_file_metadata(source_path):
+    with open(source_path, "rb") as source:
+        if os.fstat(source.fileno()).st_size == 0:
+            return extract_metadata("")
+        with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return extract_metadata(buffer)
+
+
+class MetadataCache():
+    # Page metadata keyed by the source's content hash, so a page is only
+    # read again when its bytes change. Hashes come from an
+    # assets.HashCache, which skips unchanged (size, mtime) files.
+    def __init__(self, path, hash_cache):
+        self.path = path
+        self.hash_cache = hash_cache
+        self.entries = {}
+        self.used = {}
+        self.extracted = 0
+
+    def __repr__(self):
+        return f"MetadataCache({self.path}, entries: {len(self.entries)})"
+
+    @classmethod
+    def load(cls, path, hash_cache):
+        cache = cls(path, hash_cache)
+        try:
+            with open(path) as f:
+                cache.entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+        return cache
+
+    def metadata(self, source_path):
+        key = f"{METADATA_VERSION}:{self.hash_cache.digest(source_path)}"
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = extract_file_metadata(source_path)
+            self.extracted += 1
+        self.used[key] = entry
+        return entry
+
+    def save(self):
+        write_json_atomic(self.path, self.used)
+        self.entries = self.used
+        self.used = {}
+        self.hash_cache.save()
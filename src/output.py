@@ -0,0 +1,78 @@
+import hashlib
+import json
+import os
+import threading
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def same_content(path, other_path):
+    # Sizes first: most real changes are caught without reading either file
+    try:
+        if os.path.getsize(path) != os.path.getsize(other_path):
+            return False
+    except FileNotFoundError:
+        return False
+    return file_hash(path) == file_hash(other_path)
+
+
+def temp_output_path(dest_path):
+    # Next to the destination so the final rename stays on one filesystem;
+    # pid and thread keep parallel writers from sharing a temp file
+    return f"{dest_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def commit_output(temp_path, dest_path):
+    # Identical output leaves the existing file, and its mtime, untouched,
+    # so rsync and CDN syncs only see files whose bytes changed
+    if same_content(temp_path, dest_path):
+        os.remove(temp_path)
+        return False
+    os.replace(temp_path, dest_path)
+    return True
+
+
+def write_if_changed(dest_path, write):
+    # write(temp_path) produces the new file; returns its result and
+    # whether dest_path was replaced
+    temp_path = temp_output_path(dest_path)
+    try:
+        result = write(temp_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return result, commit_output(temp_path, dest_path)
+
+
+def source_stamp(path):
+    # (size, mtime) as stored in JSON caches; a source whose stamp differs
+    # from the one recorded is read again
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def write_json_atomic(path, data, indent=None):
+    # The caches under .cache/ and the manifest: written next to path and
+    # renamed over it, so an interrupted build never leaves half a file
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = temp_output_path(path)
+    with open(temp_path, "w") as f:
+        json.dump(data, f, indent=indent, sort_keys=True)
+    os.replace(temp_path, path)
+
+
+def write_manifest(path, output_directory, changed, removed):
+    # Paths relative to public/, for deploy scripts that upload only these
+    manifest = {
+        "changed": sorted(os.path.relpath(output, output_directory) for output in changed),
+        "removed": sorted(os.path.relpath(output, output_directory) for output in removed),
+    }
+    write_json_atomic(path, manifest, indent=2)
+    return manifest
@@ -0,0 +1,171 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import profiler
+from output import commit_output, temp_output_path, write_if_changed
+
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+# Budget charged per source byte while a page is in flight: the source,
+# the rendered HTML and the copy that crosses the process boundary
+RENDER_EXPANSION = 4
+IO_THREADS = 4
+
+
+class MemoryBudget():
+    # Bytes held by pages between being read and being written. A page
+    # bigger than the whole budget is still let through, on its own.
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self.peak = 0
+        self.condition = asyncio.Condition()
+
+    def __repr__(self):
+        return f"MemoryBudget(used: {self.used}, limit: {self.limit})"
+
+    async def acquire(self, size):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.used == 0 or self.used + size <= self.limit)
+            self.used += size
+            self.peak = max(self.peak, self.used)
+
+    async def release(self, size):
+        async with self.condition:
+            self.used -= size
+            self.condition.notify_all()
+
+
+def read_source(source_path, cache=None, template_source="", asset_map_digest=""):
+    with open(source_path, "rb") as f:
+        data = f.read()
+    if cache is None:
+        return data, None, False
+    key = cache.key_for_data(data, template_source, asset_map_digest)
+    return data, key, cache.has(key)
+
+
+def write_output(dest_path, html, cache=None, key=None, cache_hit=False):
+    # Returns whether dest_path changed, or None when the cache entry was
+    # evicted since the read; rendering stays in the render stage, so the
+    # page goes round the pipeline again instead of rendering here
+    os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+    if cache_hit:
+        temp_path = temp_output_path(dest_path)
+        if not cache.fetch(key, temp_path):
+            return None
+        return commit_output(temp_path, dest_path)
+
+    def write(temp_path):
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(html)
+        if cache is not None:
+            cache.store(key, temp_path)
+
+    return write_if_changed(dest_path, write)[1]
+
+
+def record(stage, start, page, bytes_in=0, bytes_out=0):
+    # Pages interleave in the pipeline, so each stage names its page
+    # rather than relying on the profiler's open page. Returns the seconds.
+    seconds = time.perf_counter() - start
+    if profiler.PROFILER is not None:
+        profiler.PROFILER.add(stage, seconds, bytes_in, bytes_out, page)
+    return seconds
+
+
+async def run_stages(tasks, render, render_executor, renderers, cache, template_source, asset_map_digest,
+                     memory_budget, io_executor, writers):
+    # reader -> render_queue -> renderers -> write_queue -> writers. Both
+    # queues are bounded and the budget caps what is in flight, so a fast
+    # reader cannot run ahead of the workers or the disk.
+    loop = asyncio.get_running_loop()
+    budget = MemoryBudget(memory_budget)
+    render_queue = asyncio.Queue(maxsize=renderers * 2)
+    write_queue = asyncio.Queue(maxsize=writers * 2)
+    results = [None] * len(tasks)
+    # Per page, the seconds spent reading, rendering and writing it
+    page_seconds = [0.0] * len(tasks)
+
+    async def reader():
+        for position, (page, index, check_links) in enumerate(tasks):
+            source_path, dest_path = page
+            # Even the stat stays off the event loop; on a network mount
+            # it can be as slow as the read
+            cost = await loop.run_in_executor(io_executor, os.path.getsize, source_path) * RENDER_EXPANSION
+            start = time.perf_counter()
+            await budget.acquire(cost)
+            record("pipeline_budget_wait", start, source_path)
+            start = time.perf_counter()
+            data, key, cache_hit = await loop.run_in_executor(
+                io_executor, read_source, source_path, cache, template_source, asset_map_digest
+            )
+            page_seconds[position] += record("pipeline_read", start, source_path, len(data))
+            await render_queue.put((position, page, data, key, cache_hit, index, check_links, cost))
+        for _ in range(renderers):
+            await render_queue.put(None)
+
+    async def renderer():
+        while True:
+            item = await render_queue.get()
+            if item is None:
+                return
+            position, page, data, key, cache_hit, index, check_links, cost = item
+            html, terms, links = None, None, None
+            # Cache hits only visit a worker when a collector needs them
+            if not cache_hit or index or check_links:
+                start = time.perf_counter()
+                html, terms, links, profile_data = await loop.run_in_executor(
+                    render_executor, render, page[0], data, not cache_hit, index, check_links
+                )
+                page_seconds[position] += record("pipeline_render", start, page[0], len(data), len(html or ""))
+                if profile_data is not None and profiler.PROFILER is not None:
+                    profiler.PROFILER.merge(profile_data)
+            await write_queue.put((position, page, data, html, key, cache_hit, terms, links, cost))
+
+    async def render_stage():
+        await asyncio.gather(*(renderer() for _ in range(renderers)))
+        for _ in range(writers):
+            await write_queue.put(None)
+
+    async def writer():
+        while True:
+            item = await write_queue.get()
+            if item is None:
+                return
+            position, page, data, html, key, cache_hit, terms, links, cost = item
+            start = time.perf_counter()
+            changed = await loop.run_in_executor(io_executor, write_output, page[1], html, cache, key, cache_hit)
+            page_seconds[position] += record("pipeline_write", start, page[0], 0, len(html or ""))
+            if changed is not None:
+                results[position] = (cache_hit, changed, terms, links)
+                if profiler.PROFILER is not None:
+                    profiler.PROFILER.add("page", page_seconds[position], len(data), len(html or ""), page[0])
+                    profiler.PROFILER.finish_page(page_seconds[position], len(data), len(html or ""), page[0])
+            await budget.release(cost)
+
+    await asyncio.gather(reader(), render_stage(), *(writer() for _ in range(writers)))
+    return results
+
+
+def run_pipeline(tasks, render, render_executor, renderers, cache=None, template_source="", asset_map_digest="",
+                 memory_budget=DEFAULT_MEMORY_BUDGET, io_threads=IO_THREADS):
+    # tasks are (page, index, check_links); render(source_path, data, render,
+    # index, check_links) returns (html, terms, links, profile data) and runs
+    # on render_executor, the profile data None unless a worker process has
+    # numbers to merge. Returns (cache hit, changed, terms, links) per task.
+    results = [None] * len(tasks)
+    pending = list(range(len(tasks)))
+    with ThreadPoolExecutor(max_workers=io_threads) as io_executor:
+        while pending:
+            # Pages whose cache entry was evicted before it could be copied
+            # come back as None and go round again, now as cache misses
+            pass_results = asyncio.run(run_stages(
+                [tasks[position] for position in pending], render, render_executor, renderers, cache,
+                template_source, asset_map_digest, memory_budget, io_executor, io_threads,
+            ))
+            for position, result in zip(pending, pass_results):
+                results[position] = result
+            pending = [position for position, result in zip(pending, pass_results) if result is None]
+    return results
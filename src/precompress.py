@@ -0,0 +1,156 @@
+import gzip
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from copystatic import scan_tree
+from output import file_hash, temp_output_path, write_json_atomic
+
+# Text outputs nginx's gzip_static can serve; images and fonts are
+# already compressed
+COMPRESSIBLE_EXTENSIONS = (".html", ".css", ".js", ".svg", ".xml", ".json", ".txt")
+DEFAULT_MIN_BYTES = 1024
+
+
+class CompressStats():
+    def __init__(self):
+        self.compressed = 0
+        self.skipped = 0
+        self.too_small = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.changed = []
+        self.removed = []
+
+    def __repr__(self):
+        return (
+            f"CompressStats(compressed: {self.compressed}, skipped: {self.skipped}, "
+            f"too small: {self.too_small}, bytes saved: {self.bytes_saved()})"
+        )
+
+    def bytes_saved(self):
+        return self.bytes_in - self.bytes_out
+
+
+def compress_file(path, level=9):
+    # mtime=0 keeps the .gz byte-identical across builds of the same file.
+    # Returns (bytes in, bytes out, content hash); bytes out equals bytes
+    # in when compressing does not pay and no .gz is left behind.
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    compressed = gzip.compress(data, compresslevel=level, mtime=0)
+    gz_path = path + ".gz"
+    if len(compressed) >= len(data):
+        # Not worth serving; drop any stale sibling so nginx falls back
+        if os.path.exists(gz_path):
+            os.remove(gz_path)
+        return len(data), len(data), digest
+    temp_path = temp_output_path(gz_path)
+    with open(temp_path, "wb") as f:
+        f.write(compressed)
+    os.replace(temp_path, gz_path)
+    return len(data), len(compressed), digest
+
+
+def refresh_file(path, stamp, entry, has_gz, level=9):
+    # entry is what the last build recorded for path: its stamp, content
+    # hash, sizes before and after compressing and whether a .gz was worth
+    # writing. A different stamp alone does not mean different bytes
+    # (hardlinked copies keep the source's mtime, touched files keep their
+    # content), so the hash decides. Returns (entry, compressed again).
+    if entry is not None and entry["gz"] == has_gz:
+        if entry["stamp"] == stamp:
+            return entry, False
+        digest = file_hash(path)
+        if entry["hash"] == digest:
+            return dict(entry, stamp=stamp), False
+    bytes_in, bytes_out, digest = compress_file(path, level)
+    entry = {"stamp": stamp, "hash": digest, "gz": bytes_out < bytes_in, "bytes_in": bytes_in, "bytes_out": bytes_out}
+    return entry, True
+
+
+def load_state(path):
+    if path is None:
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def remove_sibling(gz_path, stats):
+    if os.path.exists(gz_path):
+        os.remove(gz_path)
+        stats.removed.append(gz_path)
+
+
+def precompress(directory, jobs=None, min_bytes=DEFAULT_MIN_BYTES, level=9, state_path=None):
+    # state_path keeps each output's last decision between builds, so
+    # files not worth compressing are not tried again every build
+    if jobs is None or jobs < 1:
+        jobs = os.cpu_count() or 1
+    stats = CompressStats()
+    previous = load_state(state_path)
+    stamps = {}
+    gz_paths = []
+    for rel_path, dir_entry in scan_tree(directory):
+        if rel_path.endswith(".gz"):
+            gz_paths.append(dir_entry.path)
+        elif rel_path.endswith(COMPRESSIBLE_EXTENSIONS):
+            stat = dir_entry.stat()
+            stamps[dir_entry.path] = [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+    # Only .gz files this function wrote are ever removed; any other .gz
+    # in the tree (a published archive, say) is an output in its own right
+    written = set(os.path.join(directory, rel_path) for rel_path, entry in previous.items() if entry["gz"])
+    has_gz = set()
+    for gz_path in gz_paths:
+        source_path = gz_path[:-len(".gz")]
+        if source_path in stamps:
+            has_gz.add(source_path)
+        elif source_path in written:
+            # The output it was made from is gone
+            remove_sibling(gz_path, stats)
+
+    pending = []
+    for path, stamp in stamps.items():
+        if stamp[0] < min_bytes:
+            stats.too_small += 1
+            if path in has_gz and path in written:
+                remove_sibling(path + ".gz", stats)
+        else:
+            rel_path = os.path.relpath(path, directory)
+            pending.append((path, stamp, previous.get(rel_path), path in has_gz))
+
+    def refresh(item):
+        return refresh_file(*item, level)
+
+    # zlib releases the GIL while deflating, so threads use every core
+    if jobs == 1 or len(pending) < 2:
+        results = [refresh(item) for item in pending]
+    else:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(refresh, pending))
+
+    state = {}
+    for (path, stamp, entry, had_gz), (new_entry, compressed) in zip(pending, results):
+        state[os.path.relpath(path, directory)] = new_entry
+        if new_entry["gz"]:
+            # Totals over every .gz in the tree, not just this build's
+            stats.bytes_in += new_entry["bytes_in"]
+            stats.bytes_out += new_entry["bytes_out"]
+        if not compressed:
+            stats.skipped += 1
+        elif new_entry["gz"]:
+            stats.compressed += 1
+            stats.changed.append(path + ".gz")
+        else:
+            stats.skipped += 1
+            if had_gz:
+                stats.removed.append(path + ".gz")
+    if state_path is not None:
+        write_json_atomic(state_path, state)
+    return stats
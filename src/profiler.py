@@ -0,0 +1,129 @@
+import contextlib
+import json
+import time
+
+# Set by enable() when the build runs with --profile. Instrumented code
+# checks `profiler.PROFILER is not None` before timing anything, so a
+# normal build pays one attribute lookup per instrumented call.
+PROFILER = None
+
+
+class Profiler():
+    def __init__(self):
+        self.stages = {}
+        self.pages = {}
+        self.page = None
+
+    def __repr__(self):
+        return f"Profiler(stages: {len(self.stages)}, pages: {len(self.pages)})"
+
+    def add(self, stage, seconds, bytes_in=0, bytes_out=0, page=None):
+        # Stage time counts towards page, or the open page when None
+        totals = self.stages.get(stage)
+        if totals is None:
+            totals = self.stages[stage] = {"calls": 0, "seconds": 0.0, "bytes_in": 0, "bytes_out": 0}
+        totals["calls"] += 1
+        totals["seconds"] += seconds
+        totals["bytes_in"] += bytes_in
+        totals["bytes_out"] += bytes_out
+        if page is None:
+            page = self.page
+        if page is not None:
+            page_stages = self.page_entry(page)["stages"]
+            page_stages[stage] = page_stages.get(stage, 0.0) + seconds
+
+    def page_entry(self, page):
+        entry = self.pages.get(page)
+        if entry is None:
+            entry = self.pages[page] = {"seconds": 0.0, "bytes_in": 0, "bytes_out": 0, "stages": {}}
+        return entry
+
+    def start_page(self, page):
+        self.page = page
+        self.page_entry(page)
+
+    def finish_page(self, seconds, bytes_in, bytes_out, page=None):
+        # Adds to what page (the open page when None) has so far; the
+        # pipeline finishes pages in parts, as they leave each stage
+        if page is None:
+            page = self.page
+        entry = self.page_entry(page)
+        entry["seconds"] += seconds
+        entry["bytes_in"] += bytes_in
+        entry["bytes_out"] += bytes_out
+        if page == self.page:
+            self.page = None
+
+    def drain(self):
+        # Hands a worker's numbers back to the parent process and resets
+        data = {"stages": self.stages, "pages": self.pages}
+        self.stages = {}
+        self.pages = {}
+        return data
+
+    def merge(self, data):
+        # Worker numbers merged while a page is open, from rendering parts
+        # of it, count towards that page's stages too
+        for stage, totals in data["stages"].items():
+            mine = self.stages.setdefault(stage, {"calls": 0, "seconds": 0.0, "bytes_in": 0, "bytes_out": 0})
+            for key, value in totals.items():
+                mine[key] += value
+            if self.page is not None:
+                page_stages = self.page_entry(self.page)["stages"]
+                page_stages[stage] = page_stages.get(stage, 0.0) + totals["seconds"]
+        for page, stats in data["pages"].items():
+            entry = self.page_entry(page)
+            for key in ("seconds", "bytes_in", "bytes_out"):
+                entry[key] += stats[key]
+            for stage, seconds in stats["stages"].items():
+                entry["stages"][stage] = entry["stages"].get(stage, 0.0) + seconds
+
+    def slowest_pages(self, count=10):
+        return sorted(self.pages.items(), key=lambda item: item[1]["seconds"], reverse=True)[:count]
+
+    def report(self):
+        return {"stages": self.stages, "pages": self.pages}
+
+    def write(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2, sort_keys=True)
+
+    def format_table(self, count=10):
+        lines = [f"{'stage':<20} {'calls':>9} {'seconds':>10} {'bytes in':>12} {'bytes out':>12}"]
+        for stage, totals in sorted(self.stages.items(), key=lambda item: item[1]["seconds"], reverse=True):
+            lines.append(
+                f"{stage:<20} {totals['calls']:>9} {totals['seconds']:>10.4f} "
+                f"{totals['bytes_in']:>12} {totals['bytes_out']:>12}"
+            )
+        slowest = self.slowest_pages(count)
+        if slowest:
+            lines.append("")
+            lines.append(f"{'slowest pages':<50} {'seconds':>10} {'bytes in':>12}")
+            for page, stats in slowest:
+                lines.append(f"{page:<50} {stats['seconds']:>10.4f} {stats['bytes_in']:>12}")
+        return "\n".join(lines)
+
+
+def enable():
+    global PROFILER
+    if PROFILER is None:
+        PROFILER = Profiler()
+    return PROFILER
+
+
+def disable():
+    global PROFILER
+    PROFILER = None
+
+
+@contextlib.contextmanager
+def timed_stage(stage, bytes_in=0):
+    # For coarse build stages in main.py; free when profiling is off
+    if PROFILER is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        PROFILER.add(stage, time.perf_counter() - start, bytes_in)
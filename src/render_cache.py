@@ -0,0 +1,96 @@
+import hashlib
+import os
+import shutil
+
+# Bump whenever a change to the renderer alters its HTML output, so pages
+# cached by an older generator are not served again.
+GENERATOR_VERSION = "4"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class RenderCache():
+    # Rendered pages stored on disk under a hash of everything that
+    # determines their output. Entries are touched on every hit, so the
+    # mtime order is the LRU order used by evict().
+    def __init__(self, cache_directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_directory = cache_directory
+        self.max_bytes = max_bytes
+
+    def __repr__(self):
+        return f"RenderCache({self.cache_directory}, {self.max_bytes})"
+
+    def key(self, source_path, template="", asset_map_digest=""):
+        digest = self.key_digest(template, asset_map_digest)
+        with open(source_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def key_for_data(self, data, template="", asset_map_digest=""):
+        # The same key as key(), for a source that has already been read
+        digest = self.key_digest(template, asset_map_digest)
+        digest.update(data)
+        return digest.hexdigest()
+
+    def key_digest(self, template, asset_map_digest):
+        digest = hashlib.sha256()
+        digest.update(GENERATOR_VERSION.encode())
+        digest.update(b"\0")
+        digest.update(template.encode())
+        digest.update(b"\0")
+        digest.update(asset_map_digest.encode())
+        digest.update(b"\0")
+        return digest
+
+    def entry_path(self, key):
+        return os.path.join(self.cache_directory, key[:2], key + ".html")
+
+    def has(self, key):
+        return os.path.exists(self.entry_path(key))
+
+    def fetch(self, key, dest_path):
+        entry_path = self.entry_path(key)
+        try:
+            shutil.copyfile(entry_path, dest_path)
+        except FileNotFoundError:
+            return False
+        os.utime(entry_path)
+        return True
+
+    def store(self, key, rendered_path):
+        entry_path = self.entry_path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        # Workers may race on the same key; the rename keeps entries whole
+        temp_path = f"{entry_path}.{os.getpid()}.tmp"
+        shutil.copyfile(rendered_path, temp_path)
+        os.replace(temp_path, entry_path)
+
+    def entries(self):
+        if not os.path.isdir(self.cache_directory):
+            return []
+        entries = []
+        with os.scandir(self.cache_directory) as buckets:
+            for bucket in buckets:
+                if not bucket.is_dir():
+                    continue
+                with os.scandir(bucket.path) as files:
+                    for entry in files:
+                        if entry.name.endswith(".html"):
+                            stat = entry.stat()
+                            entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for mtime, size, path in entries)
+        evicted = 0
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            evicted += 1
+        return evicted
+
+    def clear(self):
+        shutil.rmtree(self.cache_directory, ignore_errors=True)
@@ -0,0 +1,143 @@
+import contextlib
+import json
+import os
+import re
+
+from output import source_stamp, write_if_changed, write_json_atomic
+from split_delimiter import render_hook
+
+TERM_PATTERN = re.compile(r"\w+")
+SHARD_PREFIX_LENGTH = 2
+
+
+class PageText():
+    # Render hook keeping the text of every inline run on a page, so
+    # indexing rides on the render's own tokenizer output instead of a
+    # second parse
+    def __init__(self):
+        self.fragments = []
+
+    def __repr__(self):
+        return f"PageText(fragments: {len(self.fragments)})"
+
+    def block(self, span, line):
+        pass
+
+    def inline(self, text, nodes):
+        self.fragments.append("".join(node.value for node in nodes))
+
+    def fork(self):
+        return PageText()
+
+    def merge(self, other):
+        self.fragments.extend(other.fragments)
+
+
+@contextlib.contextmanager
+def collecting():
+    with render_hook(PageText()) as page_text:
+        yield page_text.fragments
+
+
+def page_terms(fragments):
+    # term -> word positions in the page
+    terms = {}
+    for position, match in enumerate(TERM_PATTERN.finditer(" ".join(fragments))):
+        terms.setdefault(match.group().lower(), []).append(position)
+    return terms
+
+
+def shard_prefix(term):
+    return term[:SHARD_PREFIX_LENGTH]
+
+
+class SearchIndex():
+    # Postings per page, kept between builds so only pages whose sources
+    # changed are re-indexed. Page ids are stable across builds, so a
+    # change only rewrites the shards holding that page's terms.
+    def __init__(self, path):
+        self.path = path
+        self.pages = {}
+        self.next_id = 0
+        self.dirty_prefixes = set()
+
+    def __repr__(self):
+        return f"SearchIndex({self.path}, pages: {len(self.pages)})"
+
+    @classmethod
+    def load(cls, path):
+        index = cls(path)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            index.pages = data["pages"]
+            index.next_id = data["next_id"]
+        except (OSError, ValueError, KeyError):
+            pass
+        return index
+
+    def save(self):
+        write_json_atomic(self.path, {"next_id": self.next_id, "pages": self.pages})
+
+    def is_stale(self, url, source_path):
+        page = self.pages.get(url)
+        return page is None or page["stamp"] != source_stamp(source_path)
+
+    def update(self, url, source_path, terms):
+        page = self.pages.get(url)
+        if page is None:
+            page = self.pages[url] = {"id": self.next_id}
+            self.next_id += 1
+        else:
+            self.dirty_prefixes.update(shard_prefix(term) for term in page["terms"])
+        page["stamp"] = source_stamp(source_path)
+        page["terms"] = terms
+        self.dirty_prefixes.update(shard_prefix(term) for term in terms)
+
+    def prune(self, live_urls):
+        removed = [url for url in self.pages if url not in live_urls]
+        for url in removed:
+            self.dirty_prefixes.update(shard_prefix(term) for term in self.pages.pop(url)["terms"])
+        return removed
+
+    def write_shards(self, output_directory):
+        # search/pages.json maps page ids to URLs; search/<prefix>.json maps
+        # each term with that prefix to {page id: positions}. Returns the
+        # (changed, removed) shard files.
+        shard_directory = os.path.join(output_directory, "search")
+        pages_path = os.path.join(shard_directory, "pages.json")
+        os.makedirs(shard_directory, exist_ok=True)
+        dirty = self.dirty_prefixes
+        if not os.path.exists(pages_path):
+            dirty = set(shard_prefix(term) for page in self.pages.values() for term in page["terms"])
+
+        shards = {prefix: {} for prefix in dirty}
+        for page in self.pages.values():
+            page_id = str(page["id"])
+            for term, positions in page["terms"].items():
+                shard = shards.get(shard_prefix(term))
+                if shard is not None:
+                    shard.setdefault(term, {})[page_id] = positions
+
+        changed = []
+        removed = []
+        for prefix, shard in shards.items():
+            shard_path = os.path.join(shard_directory, f"{prefix}.json")
+            if not shard:
+                if os.path.exists(shard_path):
+                    os.remove(shard_path)
+                    removed.append(shard_path)
+            elif write_json(shard_path, shard):
+                changed.append(shard_path)
+        if write_json(pages_path, {str(page["id"]): url for url, page in self.pages.items()}):
+            changed.append(pages_path)
+        self.dirty_prefixes = set()
+        return changed, removed
+
+
+def write_json(path, data):
+    def write(temp_path):
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"), sort_keys=True, ensure_ascii=False)
+
+    return write_if_changed(path, write)[1]
@@ -0,0 +1,121 @@
+import datetime
+import os
+from xml.sax.saxutils import escape
+
+from generate_page import find_markdown_files, page_output_path, page_url
+from output import write_if_changed
+
+FEED_ENTRIES = 20
+
+
+def parse_date(text):
+    # An aware UTC datetime for a front matter date: a plain date, or an
+    # ISO 8601 date and time, naive ones taken as UTC. None for anything
+    # else, so a typo cannot put an invalid timestamp in the feed.
+    try:
+        date = datetime.datetime.fromisoformat(text)
+    except ValueError:
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    return date.astimezone(datetime.timezone.utc)
+
+
+def page_date(page):
+    # Front matter date when there is a valid one, else the source's mtime
+    date = parse_date(page["date"]) if page["date"] else None
+    if date is not None:
+        return date
+    mtime = os.path.getmtime(page["source_path"])
+    return datetime.datetime.fromtimestamp(mtime, datetime.timezone.utc)
+
+
+def sitemap_date(date):
+    return date.strftime("%Y-%m-%d")
+
+
+def atom_timestamp(date):
+    # RFC 3339, as Atom requires
+    return date.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def sitemap_xml(pages, site_url):
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    for page in sorted(pages, key=lambda page: page["url"]):
+        lines.append(f"  <url><loc>{escape(site_url + page['url'])}</loc><lastmod>{sitemap_date(page_date(page))}</lastmod></url>")
+    lines.append("</urlset>")
+    return "\n".join(lines) + "\n"
+
+
+def atom_author(name, indent):
+    return f"{indent}<author><name>{escape(name)}</name></author>"
+
+
+def atom_feed(pages, site_url, title, author=None):
+    # The newest FEED_ENTRIES pages, newest first. Atom requires an
+    # author: the feed names author (or, without one, its title) and an
+    # entry whose front matter has an author names that one too.
+    dated = sorted(((page_date(page), page) for page in pages), key=lambda item: (item[0], item[1]["url"]), reverse=True)
+    dated = dated[:FEED_ENTRIES]
+    updated = atom_timestamp(dated[0][0]) if dated else "1970-01-01T00:00:00Z"
+    lines = [
+        '<?xml version="1.0" encoding="utf-8"?>',
+        '<feed xmlns="http://www.w3.org/2005/Atom">',
+        f"  <title>{escape(title)}</title>",
+        atom_author(author or title, "  "),
+        f'  <link href="{escape(site_url)}/"/>',
+        f'  <link rel="self" href="{escape(site_url)}/feed.xml"/>',
+        f"  <id>{escape(site_url)}/</id>",
+        f"  <updated>{updated}</updated>",
+    ]
+    for date, page in dated:
+        link = escape(site_url + page["url"])
+        lines.extend([
+            "  <entry>",
+            f"    <title>{escape(page['title'] or page['url'])}</title>",
+        ])
+        if page["front_matter"].get("author"):
+            lines.append(atom_author(page["front_matter"]["author"], "    "))
+        lines.extend([
+            f'    <link href="{link}"/>',
+            f"    <id>{link}</id>",
+            f"    <updated>{atom_timestamp(date)}</updated>",
+            f"    <summary>{escape(page['summary'])}</summary>",
+            "  </entry>",
+        ])
+    lines.append("</feed>")
+    return "\n".join(lines) + "\n"
+
+
+def site_pages(content_directory, dest_directory, metadata_cache):
+    # Metadata for every page, from the cache wherever the source is unchanged
+    pages = []
+    for rel_path in find_markdown_files(content_directory):
+        source_path = os.path.join(content_directory, rel_path)
+        page = dict(metadata_cache.metadata(source_path))
+        page["url"] = page_url(page_output_path(rel_path, dest_directory), dest_directory)
+        page["source_path"] = source_path
+        pages.append(page)
+    return pages
+
+
+def write_text(path, text):
+    def write(temp_path):
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    return write_if_changed(path, write)[1]
+
+
+def write_site_files(pages, output_directory, site_url, title, author=None):
+    # pages are metadata dicts with "url" and "source_path" added. Returns
+    # the files that changed.
+    site_url = site_url.rstrip("/")
+    os.makedirs(output_directory, exist_ok=True)
+    changed = []
+    files = (("sitemap.xml", sitemap_xml(pages, site_url)), ("feed.xml", atom_feed(pages, site_url, title, author)))
+    for name, text in files:
+        path = os.path.join(output_directory, name)
+        if write_text(path, text):
+            changed.append(path)
+    return changed
@@ -1,9 +1,46 @@
+import contextlib
 import enum
+import functools
+import io
+import itertools
+import mmap
+import os
 import re
+import time
+import profiler
 from textnode import TextNode, TextType
-from htmlnode import HTMLNode
+from htmlnode import LeafNode, ParentNode
 from text_to_html import text_node_to_html_node
 
+IMAGE_PATTERN = re.compile(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)")
+LINK_PATTERN = re.compile(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)")
+INLINE_TOKEN_PATTERN = re.compile(r"\*\*|\*|`|!\[|\[")
+# A block is a run of non-blank lines; group 1 starts at its first
+# non-space character. Trailing space is trimmed by block_spans.
+BLOCK_PATTERN = re.compile(r"^[^\S\n]*(\S.*(?:\n[^\S\n]*\S.*)*)", re.MULTILINE)
+BLOCK_BYTES_PATTERN = re.compile(rb"^[^\S\n]*(\S.*(?:\n[^\S\n]*\S.*)*)", re.MULTILINE)
+# Distinct inline strings whose rendered nodes are kept for reuse. Only
+# strings up to INLINE_CACHE_MAX_LENGTH are cached: labels and list items
+# repeat, long paragraphs do not and would pin the document in memory.
+INLINE_CACHE_SIZE = 8192
+INLINE_CACHE_MAX_LENGTH = 256
+# With a template, the title is the first h1 among this many leading
+# blocks; they are held until it is found, the rest of the page streams
+TITLE_LOOKAHEAD = 8
+HEADING_TAGS = (None, "h1", "h2", "h3", "h4", "h5", "h6")
+INLINE_DELIMITERS = {
+    "**": TextType.BOLD,
+    "*": TextType.ITALIC,
+    "`": TextType.CODE,
+}
+# Build stages that collect from the render (search text, link targets)
+# register here through render_hook instead of the parser knowing them.
+# A hook has block(span, line) and inline(text, nodes), called as blocks
+# and inline runs render, and fork()/merge(other) for a fresh copy to
+# run in a worker and for folding that copy's results back in.
+RENDER_HOOKS = []
+
+
 def split_nodes_delimiter(old_nodes, delimiter, text_type):
     new_nodes = []
     for old_node in old_nodes:
@@ -26,221 +63,502 @@ def split_nodes_delimiter(old_nodes, delimiter, text_type):
 
 
 def split_nodes_image(old_nodes):
-    new_nodes = []
-    for old_node in old_nodes:
-        if old_node.text_type != TextType.TEXT:
-            new_nodes.append(old_node)
-            continue
-        original_text = old_node.text
-        images = extract_markdown_images(original_text)
-        if len(images) == 0:
-            new_nodes.append(old_node)
-            continue
-        for image in images:
-            sections = original_text.split(f"![{image[0]}]({image[1]})", 1)
-            if len(sections) != 2:
-                raise ValueError("invalid markdown, image section not closed")
-            if sections[0] != "":
-                new_nodes.append(TextNode(sections[0], TextType.TEXT))
-            new_nodes.append(
-                TextNode(
-                    image[0],
-                    TextType.IMAGE,
-                    image[1],
-                )
-            )
-            original_text = sections[1]
-        if original_text != "":
-            new_nodes.append(TextNode(original_text, TextType.TEXT))
-    return new_nodes
+    return split_nodes_pattern(old_nodes, IMAGE_PATTERN, TextType.IMAGE)
 
 
 def split_nodes_link(old_nodes):
+    return split_nodes_pattern(old_nodes, LINK_PATTERN, TextType.LINK)
+
+
+def split_nodes_pattern(old_nodes, pattern, text_type):
+    # Slices by match offsets, so each text node is walked once no matter
+    # how many images or links it holds.
     new_nodes = []
     for old_node in old_nodes:
         if old_node.text_type != TextType.TEXT:
             new_nodes.append(old_node)
             continue
-        original_text = old_node.text
-        links = extract_markdown_links(original_text)
-        if len(links) == 0:
+        text = old_node.text
+        last_end = 0
+        matched = False
+        for match in pattern.finditer(text):
+            matched = True
+            if match.start() > last_end:
+                new_nodes.append(TextNode(text[last_end:match.start()], TextType.TEXT))
+            new_nodes.append(TextNode(match.group(1), text_type, match.group(2)))
+            last_end = match.end()
+        if not matched:
             new_nodes.append(old_node)
-            continue
-        for link in links:
-            sections = original_text.split(f"[{link[0]}]({link[1]})", 1)
-            if len(sections) != 2:
-                raise ValueError("invalid markdown, link section not closed")
-            if sections[0] != "":
-                new_nodes.append(TextNode(sections[0], TextType.TEXT))
-            new_nodes.append(TextNode(link[0], TextType.LINK, link[1]))
-            original_text = sections[1]
-        if original_text != "":
-            new_nodes.append(TextNode(original_text, TextType.TEXT))
+        elif last_end < len(text):
+            new_nodes.append(TextNode(text[last_end:], TextType.TEXT))
     return new_nodes
 
 
 def extract_markdown_images(text):
-    pattern = r"!\[([^\[\]]*)\]\(([^\(\)]*)\)"
-    matches = re.findall(pattern, text)
-    return matches
+    return IMAGE_PATTERN.findall(text)
 
 
 def extract_markdown_links(text):
-    pattern = r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)"
-    matches = re.findall(pattern, text)
-    return matches
+    return LINK_PATTERN.findall(text)
 
 
 def text_to_textnodes(text):
-    result = []
-    nodes = [TextNode(text, TextType.TEXT)]
-    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
-    nodes = split_nodes_delimiter(nodes, "*", TextType.ITALIC)
-    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
-    nodes = split_nodes_image(nodes)
-    nodes = split_nodes_link(nodes)
-    result.extend(nodes)
-    return result    
+    # One left-to-right scan: jump to the next marker, emit the plain text
+    # before it, then consume the whole delimited span, image or link.
+    # Delimited contents are taken literally, so `code` may contain * freely.
+    nodes = []
+    text_start = 0
+    position = 0
+    while True:
+        token = INLINE_TOKEN_PATTERN.search(text, position)
+        if token is None:
+            break
+        marker = token.group()
+        start = token.start()
+        node = None
+        if marker in INLINE_DELIMITERS:
+            end = text.find(marker, token.end())
+            if end == -1:
+                following = text[token.end():token.end() + 1]
+                if marker != "`" and (following == "" or following.isspace()):
+                    # "a * b": an unmatched star followed by space or the
+                    # end of the text is a literal star, not an opener
+                    position = token.end()
+                    continue
+                raise ValueError("invalid markdown, formatted section not closed")
+            if end > token.end():
+                node = TextNode(text[token.end():end], INLINE_DELIMITERS[marker])
+            next_position = end + len(marker)
+        else:
+            if marker == "![":
+                match = IMAGE_PATTERN.match(text, start)
+                text_type = TextType.IMAGE
+            else:
+                match = LINK_PATTERN.match(text, start)
+                text_type = TextType.LINK
+            if match is None:
+                # A stray bracket is just text
+                position = token.end()
+                continue
+            node = TextNode(match.group(1), text_type, match.group(2))
+            next_position = match.end()
+        if start > text_start:
+            nodes.append(TextNode(text[text_start:start], TextType.TEXT))
+        if node is not None:
+            nodes.append(node)
+        text_start = position = next_position
+    if text_start < len(text):
+        nodes.append(TextNode(text[text_start:], TextType.TEXT))
+    return nodes
+
 
 def markdown_to_blocks(markdown):
-    results = []
-    lines = markdown.split("\n")
+    return [span.text for span in block_spans(markdown)]
+
+
+class BlockSpan():
+    # A block as (start, end) offsets into the source buffer. The text is
+    # sliced once, and its lines split once, on first use; classification
+    # and rendering then share the same list.
+    __slots__ = ("source", "start", "end", "text_cache", "lines_cache")
+
+    def __init__(self, source, start, end):
+        self.source = source
+        self.start = start
+        self.end = end
+        self.text_cache = None
+        self.lines_cache = None
+
+    @property
+    def text(self):
+        if self.text_cache is None:
+            text = self.source[self.start:self.end]
+            if not isinstance(text, str):
+                text = text.decode("utf-8")
+            self.text_cache = text
+        return self.text_cache
+
+    @property
+    def lines(self):
+        if self.lines_cache is None:
+            self.lines_cache = self.text.split("\n")
+        return self.lines_cache
+
+    def __repr__(self):
+        return f"BlockSpan({self.start}, {self.end})"
+
+
+def block_spans(source):
+    return list(iter_block_spans(source))
+
+
+def iter_block_spans(source, start=0, end=None):
+    # source may be a str, or bytes/mmap of UTF-8 text for on-disk files.
+    # start must be at the beginning of a line.
+    pattern = BLOCK_PATTERN if isinstance(source, str) else BLOCK_BYTES_PATTERN
+    if end is None:
+        end = len(source)
+    for match in pattern.finditer(source, start, end):
+        start, end = match.span(1)
+        while source[end - 1:end].isspace():
+            end -= 1
+        yield BlockSpan(source, start, end)
+
+
+class BlockType(str, enum.Enum):
+    PARAGRAPH = "paragraph"
+    HEADING = "heading"
+    CODE = "code"
+    QUOTE = "quote"
+    UNORDERED_LIST = "unordered_list"
+    ORDERED_LIST = "ordered_list"
+
+
+# First character -> [(prefix, block_type, matcher)] for register_block_type
+CUSTOM_BLOCK_MATCHERS = {}
+
+
+def register_block_type(block_type, prefix, matcher, handler):
+    # matcher(block, lines) -> bool is only tried on blocks starting with
+    # prefix, so a custom type costs nothing for every other block.
+    # handler(block, parent=None, lines=None) must return the block's node.
+    if not prefix:
+        raise ValueError("custom block types need a non-empty prefix")
+    CUSTOM_BLOCK_MATCHERS.setdefault(prefix[0], []).append((prefix, block_type, matcher))
+    BLOCK_HANDLERS[block_type] = handler
+
+
+def block_to_block_type(block, lines=None):
+    # The first character decides which single check can apply, so each
+    # block is looked at once instead of once per candidate type.
+    first = block[:1]
+    for prefix, block_type, matcher in CUSTOM_BLOCK_MATCHERS.get(first, ()):
+        if block.startswith(prefix):
+            if lines is None:
+                lines = block.split("\n")
+            if matcher(block, lines):
+                return block_type
+
+    if first == "#":
+        level = len(block) - len(block.lstrip("#"))
+        if level <= 6 and block[level:level + 1] == " ":
+            return BlockType.HEADING
+        return BlockType.PARAGRAPH
+
+    if first == "`":
+        if block.startswith("```") and block.endswith("```"):
+            return BlockType.CODE
+        return BlockType.PARAGRAPH
+
+    if first not in (">", "*", "-", "1"):
+        return BlockType.PARAGRAPH
+
+    if lines is None:
+        lines = block.split("\n")
+    if first == ">":
+        if all(line.startswith(">") for line in lines):
+            return BlockType.QUOTE
+    elif first == "1":
+        expected_number = 1
+        for line in lines:
+            if not line.startswith(f"{expected_number}. "):
+                return BlockType.PARAGRAPH
+            expected_number += 1
+        return BlockType.ORDERED_LIST
+    elif all(line.startswith("* ") or line.startswith("- ") for line in lines):
+        return BlockType.UNORDERED_LIST
+    return BlockType.PARAGRAPH
 
-    current_block = []
-    for line in lines:
-        if line.strip() == "":
-            if current_block:
-                results.append("\n".join(current_block).strip())
-                current_block = []
-        else:
-            current_block.append(line)
-
-    if current_block:
-        results.append("\n".join(current_block).strip())
-    
-    return results
-
-def block_to_block_type(block):
-
-    lines = block.split("\n")
-
-    if block.startswith("#"):
-        count = 0
-        for char in block:
-            if char != "#":
-                break
-            count += 1
-        if count > 0 and count <= 6:
-            if block[count] == " ":
-                return "heading"
-
-    if block.startswith("```"):
-        if block.endswith("```"):
-            return "code"
-    
-    is_quote = True
-    for line in lines:
-        if line and not line.startswith(">"):
-            is_quote = False
-            break
-    if is_quote:
-        return "quote"
 
-    is_unordered = True
-    for line in lines:
-        if line and not (line.startswith("* ") or line.startswith("- ")):
-            is_unordered = False
-            break
-    if is_unordered:
-        return "unordered_list"
+def markdown_to_html_node(markdown):
+    parent = ParentNode("div", [])
+    for span in iter_block_spans(markdown):
+        block_to_html_node(span.text, parent, span.lines)
+    return parent
 
-    is_ordered = True
-    expected_number = 1
-    for line in lines:
-        expected_pattern =f"{expected_number}. "
-        if not line.startswith(expected_pattern):
-            is_ordered = False
+
+def block_to_html_node(block, parent=None, lines=None):
+    block_type = block_to_block_type(block, lines)
+    return BLOCK_HANDLERS[block_type](block, parent, lines)
+
+
+def stream_markdown_to_html(source, stream, template=None):
+    # Renders and writes one block at a time instead of building the whole
+    # div first; memory is bounded by the largest block, not the document.
+    # source is a str, bytes or a mapped file.
+    write_page(stream, iter_block_spans(source), template)
+
+
+def markdown_file_to_html(source_path, dest_path, template=None):
+    # Blocks are located in the mapped bytes and decoded one at a time, so
+    # the file is never read or decoded as a whole.
+    with open(source_path, "rb") as source:
+        with open(dest_path, "w", encoding="utf-8") as dest:
+            if os.fstat(source.fileno()).st_size == 0:
+                write_page(dest, [], template)
+                return
+            with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                spans = iter_block_spans(buffer)
+                try:
+                    write_page(dest, spans, template)
+                finally:
+                    # The suspended generator's regex scanner still exports
+                    # the map; release it so a parse error is not replaced
+                    # by a BufferError when the map closes
+                    spans.close()
+
+
+def write_page(dest, spans, template=None):
+    spans, front_matter = split_front_matter(spans)
+    if template is None:
+        write_blocks(dest, spans)
+        return
+    title, leading = page_title(spans)
+    title = front_matter.get("title", title)
+    template.render_to(dest, title, lambda stream: write_blocks(stream, itertools.chain(leading, spans)))
+
+
+def is_front_matter(lines):
+    return len(lines) >= 2 and lines[0].strip() == "---" and lines[-1].strip() == "---"
+
+
+def parse_front_matter(lines):
+    # Flat "key: value" pairs only; keys are lowercased
+    front_matter = {}
+    for line in lines[1:-1]:
+        key, separator, value = line.partition(":")
+        if separator:
+            front_matter[key.strip().lower()] = value.strip().strip("\"'")
+    return front_matter
+
+
+def split_front_matter(spans):
+    # A leading "---" fenced block is page metadata, not content. Returns
+    # an iterator over the remaining spans and the parsed front matter.
+    spans = iter(spans)
+    first = next(spans, None)
+    if first is None:
+        return spans, {}
+    if is_front_matter(first.lines):
+        return spans, parse_front_matter(first.lines)
+    return itertools.chain([first], spans), {}
+
+
+def page_title(spans):
+    # Pulls up to TITLE_LOOKAHEAD spans looking for the first h1 and hands
+    # them back with the title, so the content slot renders them without
+    # splitting the source again. spans must be an iterator; the h1's
+    # inline nodes land in the inline cache for when it is rendered.
+    leading = []
+    for span in itertools.islice(spans, TITLE_LOOKAHEAD):
+        leading.append(span)
+        title = h1_text(span.text)
+        if title is not None:
+            return title, leading
+    return "", leading
+
+
+def h1_text(block):
+    # The plain text of an h1 block, None for any other block; the one
+    # title rule shared by page <title>s and metadata.extract_metadata
+    if not block.startswith("# "):
+        return None
+    return "".join(node.value for node in inline_nodes(block[2:].strip()))
+
+
+@contextlib.contextmanager
+def render_hook(hook):
+    RENDER_HOOKS.append(hook)
+    try:
+        yield hook
+    finally:
+        RENDER_HOOKS.remove(hook)
+
+
+def hooked_spans(spans, line=1, offset=0):
+    # Passes spans through, telling every hook each block and its line;
+    # line is the number of the line offset is on
+    for span in spans:
+        newline = "\n" if isinstance(span.source, str) else b"\n"
+        line += span.source[offset:span.start].count(newline)
+        offset = span.start
+        for hook in RENDER_HOOKS:
+            hook.block(span, line)
+        yield span
+
+
+def write_blocks(dest, spans):
+    if RENDER_HOOKS:
+        spans = hooked_spans(spans)
+    dest.write("<div>")
+    if profiler.PROFILER is None:
+        for span in spans:
+            block_to_html_node(span.text, None, span.lines).render_to(dest)
+    else:
+        profiled_blocks_to_html(spans, dest, profiler.PROFILER)
+    dest.write("</div>")
+
+
+def render_markdown(source, template=None):
+    # The page markdown_file_to_html would write, as a string, for sources
+    # that are already in memory; bytes are decoded a block at a time
+    stream = io.StringIO()
+    stream_markdown_to_html(source, stream, template)
+    return stream.getvalue()
+
+
+def parse_markdown_file(source_path):
+    with open(source_path, "rb") as f:
+        parse_markdown(f.read())
+
+
+def parse_markdown(source):
+    # Builds every block without rendering, for collectors that need the
+    # inline nodes of a page whose HTML came out of the render cache
+    spans, front_matter = split_front_matter(iter_block_spans(source))
+    if RENDER_HOOKS:
+        spans = hooked_spans(spans)
+    for span in spans:
+        block_to_html_node(span.text, None, span.lines)
+
+
+def profiled_blocks_to_html(spans, dest, profile):
+    # The markdown_file_to_html loop with every stage timed; block_build
+    # includes the inline_parse time recorded inside it.
+    clock = time.perf_counter
+    spans = iter(spans)
+    while True:
+        start = clock()
+        span = next(spans, None)
+        if span is None:
             break
-        expected_number += 1
-    if is_ordered:
-        return "ordered_list"
-    
-    return "paragraph"
+        text = span.text
+        lines = span.lines
+        split_done = clock()
+        node = block_to_html_node(text, None, lines)
+        build_done = clock()
+        node.render_to(dest)
+        render_done = clock()
+        profile.add("block_split", split_done - start, span.end - span.start)
+        profile.add("block_build", build_done - split_done, len(text))
+        profile.add("render_write", render_done - build_done)
 
-def markdown_to_html_node(markdown):
-    parent = HTMLNode("div", None, [])
-    markdown_blocks = markdown_to_blocks(markdown)
-    for block in markdown_blocks:
-       block_type = block_to_block_type(block)
-       if block_type == "paragraph": #
-           paragraph_block(block, parent)
-       if block_type == "code": # 
-           code_block(block, parent)
-       if block_type == "heading": # 
-            heading_block(block, parent)
-       if block_type == "ordered_list": #
-           ordered_block(block, parent)
-       if block_type == "quote":
-           quote_block(block, parent)
-       if block_type == "unordered_list": #
-           unordered_block(block, parent)
-    return parent
 
 def text_to_children(text):
-    text_nodes = text_to_textnodes(text)
-    return [text_node_to_html_node(text_node) for text_node in text_nodes]
+    profile = profiler.PROFILER
+    if profile is not None:
+        start = time.perf_counter()
+    children = list(inline_nodes(text))
+    for hook in RENDER_HOOKS:
+        hook.inline(text, children)
+    if profile is not None:
+        profile.add("inline_parse", time.perf_counter() - start, len(text))
+    return children
 
 
-def paragraph_block(block, parent):
-    paragraph_node = HTMLNode("p", None, [])
-    paragraph_node.children = text_to_children(block)
-    parent.children.append(paragraph_node)
+@functools.lru_cache(maxsize=INLINE_CACHE_SIZE)
+def inline_html_nodes(text):
+    # List items, nav labels and repeated headings recur thousands of times
+    # across a site; each distinct string is tokenized once per process.
+    # The tuple is shared by every caller, so its nodes must never be
+    # mutated: anything that rewrites props has to build new nodes.
+    return tuple(text_node_to_html_node(text_node) for text_node in text_to_textnodes(text))
+
+
+def inline_nodes(text):
+    if len(text) <= INLINE_CACHE_MAX_LENGTH:
+        return inline_html_nodes(text)
+    return inline_html_nodes.__wrapped__(text)
+
+
+def inline_cache_info():
+    return inline_html_nodes.cache_info()
 
 
-def code_block(block, parent):
-    pre_node = HTMLNode("pre", None, [])
-    code_node = HTMLNode("code", None, [])
-    code_node.children = text_to_children(block)
+def clear_inline_cache():
+    inline_html_nodes.cache_clear()
+
+
+def paragraph_block(block, parent=None, lines=None):
+    paragraph_node = ParentNode("p", [])
+    paragraph_node.children = text_to_children(block)
+    if parent is not None:
+        parent.children.append(paragraph_node)
+    return paragraph_node
+
+
+def code_block(block, parent=None, lines=None):
+    pre_node = ParentNode("pre", [])
+    code_node = ParentNode("code", [])
+    # Code is literal: drop the fences (and any info string after the
+    # opening one) instead of running it through the inline parser
+    code = block[3:-3]
+    if "\n" in code:
+        code = code.split("\n", 1)[1]
+    # An empty fence renders as an empty element; a leaf needs a value
+    code_node.children = [LeafNode(None, code)] if code else []
     pre_node.children = [code_node]
-    parent.children.append(pre_node)
+    if parent is not None:
+        parent.children.append(pre_node)
+    return pre_node
 
-def heading_block(block, parent):
+def heading_block(block, parent=None, lines=None):
     level = 0
     for char in block:
         if char == '#':
             level += 1
         else:
             break
-    heading_tag = f"h{level}"
+    heading_tag = HEADING_TAGS[level]
     content = block[level:].strip()
-    heading_node = HTMLNode(heading_tag, None, [])
+    heading_node = ParentNode(heading_tag, [])
     heading_node.children = text_to_children(content)
-    parent.children.append(heading_node)
-
-def ordered_block(block, parent):
-    ordered_node = HTMLNode("ol", None, [])
-    lines = block.split("\n")
+    if parent is not None:
+        parent.children.append(heading_node)
+    return heading_node
+
+def ordered_block(block, parent=None, lines=None):
+    ordered_node = ParentNode("ol", [])
+    if lines is None:
+        lines = block.split("\n")
     for line in lines:
         content = line.split(".", 1)[1].strip()
-        list_item = HTMLNode("li", None, [])
+        list_item = ParentNode("li", [])
         list_item.children = text_to_children(content)
         ordered_node.children.append(list_item)
-    parent.children.append(ordered_node)
+    if parent is not None:
+        parent.children.append(ordered_node)
+    return ordered_node
 
 
-def quote_block(block, parent):
-    quote_node = HTMLNode("blockquote", None, [])
+def quote_block(block, parent=None, lines=None):
+    quote_node = ParentNode("blockquote", [])
     content = block.replace("> ", "")
     quote_node.children = text_to_children(content)
-    parent.children.append(quote_node)
+    if parent is not None:
+        parent.children.append(quote_node)
+    return quote_node
 
 
-def unordered_block(block, parent):
-    unordered_node = HTMLNode("ul", None, [])
-    lines = block.split("\n")
+def unordered_block(block, parent=None, lines=None):
+    unordered_node = ParentNode("ul", [])
+    if lines is None:
+        lines = block.split("\n")
     for line in lines:
-        list_item = HTMLNode("li", None, [])
-        content = line.replace("* ", "")
+        list_item = ParentNode("li", [])
+        content = line[2:]
         list_item.children = text_to_children(content)
         unordered_node.children.append(list_item)
-    parent.children.append(unordered_node)
+    if parent is not None:
+        parent.children.append(unordered_node)
+    return unordered_node
+
+
+BLOCK_HANDLERS = {
+    BlockType.PARAGRAPH: paragraph_block,
+    BlockType.HEADING: heading_block,
+    BlockType.CODE: code_block,
+    BlockType.QUOTE: quote_block,
+    BlockType.UNORDERED_LIST: unordered_block,
+    BlockType.ORDERED_LIST: ordered_block,
+}
@@ -0,0 +1,65 @@
+import os
+import re
+
+SLOT_PATTERN = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+URL_ATTRIBUTE_PATTERN = re.compile(r'((?:href|src)=")([^"]*)(")')
+SLOTS = ("Title", "Content")
+
+# Compiled templates by path, with the (size, mtime) they were read at and
+# the asset map they were compiled against, so every page a worker renders
+# reuses one parse until the file or the map changes.
+LOADED_TEMPLATES = {}
+
+
+class Template():
+    # A page template split once into literal text and named slots. The
+    # Content slot is filled by a callback that streams straight into the
+    # output, so the rendered page is never held as one string.
+    def __init__(self, source, asset_map=None):
+        self.source = source
+        self.segments = []
+        position = 0
+        for match in SLOT_PATTERN.finditer(source):
+            slot = match.group(1)
+            if slot not in SLOTS:
+                raise ValueError(f"unknown template slot: {slot}")
+            if slot == "Content" and ("slot", "Content") in self.segments:
+                raise ValueError("template has more than one Content slot")
+            if match.start() > position:
+                self.segments.append(("text", source[position:match.start()]))
+            self.segments.append(("slot", slot))
+            position = match.end()
+        if position < len(source):
+            self.segments.append(("text", source[position:]))
+        if asset_map:
+            # Fingerprinted asset URLs are baked into the literal text once
+            rewrite = lambda match: match.group(1) + asset_map.get(match.group(2), match.group(2)) + match.group(3)
+            self.segments = [
+                (kind, URL_ATTRIBUTE_PATTERN.sub(rewrite, value) if kind == "text" else value)
+                for kind, value in self.segments
+            ]
+
+    def __repr__(self):
+        return f"Template({len(self.segments)} segments)"
+
+    def render_to(self, stream, title, write_content):
+        for kind, value in self.segments:
+            if kind == "text":
+                stream.write(value)
+            elif value == "Title":
+                stream.write(title)
+            else:
+                write_content(stream)
+
+
+def load_template(path, asset_map=None):
+    stat = os.stat(path)
+    stamp = (stat.st_size, stat.st_mtime_ns)
+    loaded = LOADED_TEMPLATES.get(path)
+    # Asset maps are replaced, never mutated, so identity is enough
+    if loaded is not None and loaded[0] == stamp and loaded[1] is asset_map:
+        return loaded[2]
+    with open(path, encoding="utf-8") as f:
+        template = Template(f.read(), asset_map)
+    LOADED_TEMPLATES[path] = (stamp, asset_map, template)
+    return template
@@ -0,0 +1,101 @@
+import os
+import unittest
+
+import assets
+from assets import HashCache, build_assets, fingerprint_path, read_asset_map, write_asset_map
+from fixtures import TempDirTestCase, read_file, write_file
+from generate_page import generate_pages, use_asset_map
+from output import file_hash
+from split_delimiter import markdown_to_html_node
+from template import Template
+
+
+class TestBuildAssets(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.static = os.path.join(self.temp.name, "static")
+        self.public = os.path.join(self.temp.name, "public")
+        self.hashes = os.path.join(self.temp.name, "cache", "hashes.json")
+        write_file(os.path.join(self.static, "index.css"), "body {}")
+        write_file(os.path.join(self.static, "images", "logo.png"), "png")
+        write_file(os.path.join(self.static, "blog", "logo.png"), "png")
+
+    def tearDown(self):
+        use_asset_map(None)
+
+    def build(self, previous_map=None):
+        hash_cache = HashCache.load(self.hashes)
+        asset_map, stats = build_assets(self.static, self.public, hash_cache, previous_map)
+        hash_cache.save()
+        return asset_map, stats, hash_cache
+
+    def test_fingerprint_path(self):
+        self.assertEqual(fingerprint_path("css/site.css", "0123456789abcdef"), "css/site.0123456789ab.css")
+        self.assertEqual(fingerprint_path("CNAME", "0123456789abcdef"), "CNAME.0123456789ab")
+
+    def test_assets_are_fingerprinted(self):
+        asset_map, stats, hash_cache = self.build()
+        digest = file_hash(os.path.join(self.static, "index.css"))[:12]
+        self.assertEqual(asset_map["/index.css"], f"/index.{digest}.css")
+        self.assertEqual(read_file(os.path.join(self.public, f"index.{digest}.css")), "body {}")
+        self.assertFalse(os.path.exists(os.path.join(self.public, "index.css")))
+
+    def test_duplicates_are_hardlinked(self):
+        asset_map, stats, hash_cache = self.build()
+        self.assertEqual((stats.copied, stats.deduplicated), (2, 1))
+        blog_logo = os.path.join(self.public, asset_map["/blog/logo.png"][1:])
+        images_logo = os.path.join(self.public, asset_map["/images/logo.png"][1:])
+        self.assertTrue(os.path.samefile(blog_logo, images_logo))
+
+    def test_unchanged_assets_are_not_rehashed(self):
+        self.build()
+        asset_map, stats, hash_cache = self.build()
+        self.assertEqual((hash_cache.hits, hash_cache.misses), (3, 0))
+        self.assertEqual((stats.copied, stats.skipped, stats.changed), (0, 2, []))
+
+    def test_changed_asset_replaces_old_output(self):
+        old_map = self.build()[0]
+        write_file(os.path.join(self.static, "index.css"), "body { color: red; }")
+        asset_map, stats, hash_cache = self.build(old_map)
+        self.assertNotEqual(asset_map["/index.css"], old_map["/index.css"])
+        self.assertEqual(stats.removed, [os.path.join(self.public, old_map["/index.css"][1:])])
+        self.assertEqual(stats.changed, [os.path.join(self.public, asset_map["/index.css"][1:])])
+
+    def test_asset_map_file_is_rewritten_only_on_change(self):
+        map_path = os.path.join(self.temp.name, "cache", "asset-map.json")
+        asset_map = self.build()[0]
+        self.assertTrue(write_asset_map(map_path, asset_map))
+        self.assertFalse(write_asset_map(map_path, asset_map))
+        self.assertEqual(read_asset_map(map_path), asset_map)
+
+    def test_pages_and_template_use_fingerprinted_urls(self):
+        map_path = os.path.join(self.temp.name, "cache", "asset-map.json")
+        asset_map = self.build()[0]
+        write_asset_map(map_path, asset_map)
+        content = os.path.join(self.temp.name, "content")
+        template_path = os.path.join(self.temp.name, "template.html")
+        write_file(os.path.join(content, "index.md"), "![logo](/images/logo.png) [style](/index.css) [ext](https://example.com)")
+        write_file(template_path, '<link href="/index.css">{{ Content }}')
+        generate_pages(content, self.public, jobs=1, template_path=template_path, asset_map_path=map_path)
+        self.assertEqual(
+            read_file(os.path.join(self.public, "index.html")),
+            f'<link href="{asset_map["/index.css"]}"><div><p><img src="{asset_map["/images/logo.png"]}" alt="logo">'
+            f' <a href="{asset_map["/index.css"]}">style</a> <a href="https://example.com">ext</a></p></div>',
+        )
+
+    def test_template_rewrite(self):
+        template = Template('<img src="/a.png"><a href="/b.html">{{ Content }}', {"/a.png": "/a.1234.png"})
+        self.assertEqual(template.segments[0], ("text", '<img src="/a.1234.png"><a href="/b.html">'))
+
+    def test_switching_maps_clears_cached_links(self):
+        map_path = os.path.join(self.temp.name, "cache", "asset-map.json")
+        write_asset_map(map_path, {"/x.css": "/x.1.css"})
+        use_asset_map(map_path)
+        self.assertEqual(markdown_to_html_node("[x](/x.css)").to_html(), '<div><p><a href="/x.1.css">x</a></p></div>')
+        use_asset_map(None)
+        self.assertEqual(assets.ASSET_MAP, {})
+        self.assertEqual(markdown_to_html_node("[x](/x.css)").to_html(), '<div><p><a href="/x.css">x</a></p></div>')
+
+
+if __name__ == "__main__":
+    unittest.main()
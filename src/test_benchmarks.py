@@ -0,0 +1,27 @@
+import unittest
+
+import corpus
+from benchmarks import compare
+from split_delimiter import markdown_to_html_node
+
+
+class TestCorpus(unittest.TestCase):
+    def test_document_is_deterministic(self):
+        self.assertEqual(corpus.document(seed=3, sections=20), corpus.document(seed=3, sections=20))
+        self.assertNotEqual(corpus.document(seed=3, sections=20), corpus.document(seed=4, sections=20))
+
+    def test_document_renders(self):
+        html = markdown_to_html_node(corpus.document(sections=50)).to_html()
+        self.assertTrue(html.startswith("<div><h1>Generated document</h1>"))
+
+
+class TestCompare(unittest.TestCase):
+    def test_flags_only_grown_timings(self):
+        baseline = {"results": {"to_html": {"seconds": 1.0, "nodes": 10}, "gone": {"seconds": 1.0}}}
+        results = {"to_html": {"seconds": 1.5, "nodes": 20}, "new": {"seconds": 9.0}}
+        self.assertEqual(compare(results, baseline, 0.2), ["to_html.seconds: 1 -> 1.5 (+50%)"])
+        self.assertEqual(compare(results, baseline, 0.6), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import os
+import unittest
+
+from copystatic import recursive_copier, sync_static
+from depgraph import DependencyGraph
+from fixtures import TempDirTestCase, write_file
+
+
+class TestSyncStatic(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.source = os.path.join(self.temp.name, "static")
+        self.public = os.path.join(self.temp.name, "public")
+        self.graph_path = os.path.join(self.temp.name, "cache", "depgraph.json")
+        write_file(os.path.join(self.source, "index.css"), "body {}")
+        write_file(os.path.join(self.source, "images", "logo.png"), "png")
+
+    def sync(self, use_hash=False):
+        graph = DependencyGraph.load(self.graph_path)
+        stats = sync_static(self.source, self.public, graph, use_hash=use_hash)
+        graph.save()
+        return stats
+
+    def test_first_sync_copies_everything(self):
+        stats = self.sync()
+        self.assertEqual((stats.copied, stats.skipped, stats.pruned), (2, 0, 0))
+        self.assertTrue(os.path.exists(os.path.join(self.public, "images", "logo.png")))
+
+    def test_second_sync_skips_unchanged(self):
+        self.sync()
+        stats = self.sync()
+        self.assertEqual((stats.copied, stats.skipped, stats.pruned), (0, 2, 0))
+
+    def test_changed_file_is_copied(self):
+        self.sync()
+        write_file(os.path.join(self.source, "index.css"), "body { color: red; }")
+        stats = self.sync()
+        self.assertEqual((stats.copied, stats.skipped), (1, 1))
+        with open(os.path.join(self.public, "index.css")) as f:
+            self.assertEqual(f.read(), "body { color: red; }")
+
+    def test_missing_output_is_recopied(self):
+        self.sync()
+        os.remove(os.path.join(self.public, "index.css"))
+        stats = self.sync()
+        self.assertEqual(stats.copied, 1)
+
+    def test_removed_source_is_pruned(self):
+        self.sync()
+        os.remove(os.path.join(self.source, "images", "logo.png"))
+        write_file(os.path.join(self.public, "index.html"), "<html></html>")
+        stats = self.sync()
+        self.assertEqual(stats.pruned, 1)
+        self.assertFalse(os.path.exists(os.path.join(self.public, "images")))
+        # Outputs that did not come from static/ are left alone
+        self.assertTrue(os.path.exists(os.path.join(self.public, "index.html")))
+
+    def test_touched_identical_file_is_not_rewritten(self):
+        self.sync()
+        css_path = os.path.join(self.source, "index.css")
+        stat = os.stat(css_path)
+        os.utime(css_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        stats = self.sync()
+        self.assertEqual((stats.copied, stats.skipped, stats.changed), (0, 2, []))
+
+    def test_hash_mode_skips_touched_identical_file(self):
+        self.sync(use_hash=True)
+        css_path = os.path.join(self.source, "index.css")
+        stat = os.stat(css_path)
+        os.utime(css_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        stats = self.sync(use_hash=True)
+        self.assertEqual((stats.copied, stats.skipped), (0, 2))
+
+
+class TestRecursiveCopier(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.source = os.path.join(self.temp.name, "static")
+        self.public = os.path.join(self.temp.name, "public")
+        for i in range(20):
+            write_file(os.path.join(self.source, f"dir{i % 3}", "nested", f"file{i}.txt"), f"content {i}")
+
+    def read_public(self, rel_path):
+        with open(os.path.join(self.public, rel_path)) as f:
+            return f.read()
+
+    def test_parallel_copy(self):
+        stats = recursive_copier(self.source, self.public, jobs=4, verbose=False)
+        self.assertEqual(stats.copied, 20)
+        self.assertEqual(self.read_public("dir1/nested/file7.txt"), "content 7")
+
+    def test_hardlink_mode(self):
+        recursive_copier(self.source, self.public, jobs=2, mode="hardlink", verbose=False)
+        source_stat = os.stat(os.path.join(self.source, "dir0", "nested", "file0.txt"))
+        public_stat = os.stat(os.path.join(self.public, "dir0", "nested", "file0.txt"))
+        self.assertEqual(source_stat.st_ino, public_stat.st_ino)
+
+    def test_reflink_mode_falls_back_to_copy(self):
+        recursive_copier(self.source, self.public, mode="reflink", verbose=False)
+        self.assertEqual(self.read_public("dir2/nested/file2.txt"), "content 2")
+
+    def test_copy_after_hardlink_does_not_touch_source(self):
+        recursive_copier(self.source, self.public, mode="hardlink", verbose=False)
+        recursive_copier(self.source, self.public, mode="copy", verbose=False)
+        write_file(os.path.join(self.public, "dir0", "nested", "file0.txt"), "changed")
+        with open(os.path.join(self.source, "dir0", "nested", "file0.txt")) as f:
+            self.assertEqual(f.read(), "content 0")
+
+    def test_identical_files_are_not_rewritten(self):
+        recursive_copier(self.source, self.public, verbose=False)
+        write_file(os.path.join(self.source, "dir0", "nested", "file0.txt"), "changed")
+        stats = recursive_copier(self.source, self.public, jobs=4, verbose=False)
+        self.assertEqual((stats.copied, stats.skipped), (1, 19))
+        self.assertEqual(stats.changed, [os.path.join(self.public, "dir0", "nested", "file0.txt")])
+        self.assertEqual(self.read_public("dir0/nested/file0.txt"), "changed")
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            recursive_copier(self.source, self.public, mode="teleport", verbose=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import contextlib
+import io
+import os
+import unittest
+
+import main
+from depgraph import DependencyGraph
+from fixtures import TempDirTestCase, read_file, write_file
+from generate_page import generate_pages
+
+
+class TestDependencyGraph(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.graph_path = os.path.join(self.temp.name, "depgraph.json")
+        self.template = os.path.join(self.temp.name, "template.html")
+        self.pages = [os.path.join(self.temp.name, name) for name in ("a.md", "b.md")]
+        self.outputs = [os.path.join(self.temp.name, name) for name in ("a.html", "b.html")]
+        for path in [self.template] + self.pages + self.outputs:
+            write_file(path, "x")
+
+    def build(self):
+        graph = DependencyGraph.load(self.graph_path)
+        stale = []
+        for page, output in zip(self.pages, self.outputs):
+            if graph.is_stale(output, [page, self.template]):
+                stale.append(output)
+            graph.record(output, [page, self.template], "page")
+        graph.save()
+        return stale
+
+    def test_first_build_is_all_stale(self):
+        self.assertEqual(self.build(), self.outputs)
+        self.assertEqual(self.build(), [])
+
+    def test_changed_page_rebuilds_one_output(self):
+        self.build()
+        write_file(self.pages[1], "changed", mtime_offset=10**9)
+        self.assertEqual(self.build(), [self.outputs[1]])
+
+    def test_changed_template_rebuilds_everything(self):
+        self.build()
+        write_file(self.template, "changed", mtime_offset=10**9)
+        self.assertEqual(self.build(), self.outputs)
+
+    def test_missing_output_is_stale(self):
+        self.build()
+        os.remove(self.outputs[0])
+        self.assertEqual(self.build(), [self.outputs[0]])
+
+    def test_removed_outputs(self):
+        graph = DependencyGraph(self.graph_path)
+        graph.record(self.outputs[0], [self.pages[0]], "page")
+        graph.record(self.outputs[1], [self.pages[1]], "static")
+        self.assertEqual(graph.removed_outputs("page", set()), [self.outputs[0]])
+        self.assertEqual(list(graph.outputs), [self.outputs[1]])
+
+
+class TestIncrementalPages(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.temp.name, "content")
+        self.public = os.path.join(self.temp.name, "public")
+        self.graph_path = os.path.join(self.temp.name, "depgraph.json")
+        write_file(os.path.join(self.content, "a.md"), "# A")
+        write_file(os.path.join(self.content, "b.md"), "# B")
+
+    def build(self):
+        graph = DependencyGraph.load(self.graph_path)
+        stats = generate_pages(self.content, self.public, jobs=1, graph=graph)
+        graph.save()
+        return stats
+
+    def test_only_changed_pages_rebuild(self):
+        self.assertEqual(self.build().rendered, 2)
+        stats = self.build()
+        self.assertEqual((stats.rendered, stats.skipped), (0, 2))
+        write_file(os.path.join(self.content, "b.md"), "# B again", mtime_offset=10**9)
+        stats = self.build()
+        self.assertEqual((stats.rendered, stats.skipped), (1, 1))
+
+    def test_deleted_page_is_pruned(self):
+        self.build()
+        os.remove(os.path.join(self.content, "a.md"))
+        stats = self.build()
+        self.assertEqual(stats.pruned, 1)
+        self.assertFalse(os.path.exists(os.path.join(self.public, "a.html")))
+
+
+class TestRebuildAfterFailure(TempDirTestCase):
+    # main.build() on one graph, the way --watch rebuilds
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.temp.name)
+        write_file(os.path.join("content", "a.md"), "# A")
+        write_file(os.path.join("content", "b.md"), "# B")
+        write_file(os.path.join("static", "a.css"), "a {}")
+        self.args = main.parse_args(["--incremental", "--no-cache", "-j", "1", "--manifest", "changes.json"])
+        self.graph = DependencyGraph.load(main.DEPENDENCY_GRAPH)
+
+    def build(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            main.build(self.args, None, self.graph)
+
+    def test_edits_after_failed_build_are_rebuilt(self):
+        self.build()
+        write_file(os.path.join("content", "a.md"), "**broken", mtime_offset=10**9)
+        with self.assertRaises(ValueError):
+            self.build()
+        write_file(os.path.join("content", "a.md"), "# A fixed", mtime_offset=2 * 10**9)
+        write_file(os.path.join("content", "b.md"), "# B edited", mtime_offset=10**9)
+        write_file(os.path.join("static", "a.css"), "b {}", mtime_offset=10**9)
+        self.build()
+        self.assertIn("A fixed", read_file(os.path.join("public", "a.html")))
+        self.assertIn("B edited", read_file(os.path.join("public", "b.html")))
+        self.assertEqual(read_file(os.path.join("public", "a.css")), "b {}")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import unittest
+
+from depgraph import DependencyGraph
+from fixtures import TempDirTestCase, read_file, write_file
+from generate_page import chunk_size, find_markdown_files, generate_pages
+
+
+class TestGeneratePages(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.temp.name, "content")
+        self.public = os.path.join(self.temp.name, "public")
+        write_file(os.path.join(self.content, "index.md"), "# Home\n\nWelcome **home**")
+        write_file(os.path.join(self.content, "blog", "first.md"), "# First\n\n```\nx = `a` * b\n```")
+        write_file(os.path.join(self.content, "blog", "second.md"), "* one\n* two")
+        write_file(os.path.join(self.content, "notes.txt"), "not a page")
+
+    def test_find_markdown_files(self):
+        self.assertEqual(find_markdown_files(self.content), ["blog/first.md", "blog/second.md", "index.md"])
+
+    def test_generate_pages_serial(self):
+        stats = generate_pages(self.content, self.public, jobs=1)
+        self.assertEqual(stats.rendered, 3)
+        self.assertEqual(
+            read_file(os.path.join(self.public, "index.html")),
+            "<div><h1>Home</h1><p>Welcome <b>home</b></p></div>",
+        )
+
+    def test_generate_pages_parallel(self):
+        generate_pages(self.content, self.public, jobs=2)
+        self.assertEqual(
+            read_file(os.path.join(self.public, "blog", "first.html")),
+            "<div><h1>First</h1><pre><code>x = `a` * b\n</code></pre></div>",
+        )
+        self.assertEqual(
+            read_file(os.path.join(self.public, "blog", "second.html")),
+            "<div><ul><li>one</li><li>two</li></ul></div>",
+        )
+        self.assertFalse(os.path.exists(os.path.join(self.public, "notes.html")))
+
+    def test_generate_pages_with_template(self):
+        template_path = os.path.join(self.temp.name, "template.html")
+        write_file(template_path, "<title>{{ Title }}</title>{{ Content }}")
+        generate_pages(self.content, self.public, jobs=2, template_path=template_path)
+        self.assertEqual(
+            read_file(os.path.join(self.public, "index.html")),
+            "<title>Home</title><div><h1>Home</h1><p>Welcome <b>home</b></p></div>",
+        )
+
+    def test_template_change_rebuilds_every_page(self):
+        template_path = os.path.join(self.temp.name, "template.html")
+        write_file(template_path, "{{ Content }}")
+        graph = DependencyGraph(os.path.join(self.temp.name, "depgraph.json"))
+        generate_pages(self.content, self.public, jobs=1, graph=graph, template_path=template_path)
+        graph.save()
+        self.assertEqual(generate_pages(self.content, self.public, jobs=1, graph=graph,
+                                        template_path=template_path).rendered, 0)
+        graph.save()
+        write_file(template_path, "<main>{{ Content }}</main>")
+        stats = generate_pages(self.content, self.public, jobs=1, graph=graph, template_path=template_path)
+        self.assertEqual(stats.rendered, 3)
+        self.assertTrue(read_file(os.path.join(self.public, "index.html")).startswith("<main><div>"))
+
+    def test_unchanged_pages_are_not_rewritten(self):
+        first = generate_pages(self.content, self.public, jobs=1)
+        self.assertEqual(len(first.changed), 3)
+        write_file(os.path.join(self.content, "index.md"), "# Home\n\nWelcome **back**")
+        second = generate_pages(self.content, self.public, jobs=2)
+        self.assertEqual(second.rendered, 3)
+        self.assertEqual(second.changed, [os.path.join(self.public, "index.html")])
+
+    def test_chunk_size(self):
+        self.assertEqual(chunk_size(3, 8), 1)
+        self.assertEqual(chunk_size(50000, 8), 1562)
+
+
+if __name__ == "__main__":
+    unittest.main()
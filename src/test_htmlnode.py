@@ -1,3 +1,4 @@
+import io
 import unittest
 from htmlnode import LeafNode, ParentNode, HTMLNode
 
@@ -101,6 +102,37 @@ class TestHTMLNode(unittest.TestCase):
             "<h2><b>Bold text</b>Normal text<i>italic text</i>Normal text</h2>",
         )
 
+    def test_leaf_props(self):
+        node = LeafNode("a", "Click me!", {"href": "https://www.google.com"})
+        self.assertEqual(node.to_html(), '<a href="https://www.google.com">Click me!</a>')
+
+    def test_leaf_void_tag(self):
+        node = LeafNode("img", "", {"src": "/rivendell.png", "alt": "Rivendell"})
+        self.assertEqual(node.to_html(), '<img src="/rivendell.png" alt="Rivendell">')
+
+    def test_iter_html_chunks(self):
+        node = ParentNode("p", [LeafNode("b", "Bold"), LeafNode(None, " text")])
+        self.assertEqual(list(node.iter_html()), ["<p>", "<b>Bold</b>", " text", "</p>"])
+
+    def test_render_to_stream(self):
+        node = ParentNode("div", [ParentNode("span", [LeafNode("i", "x")])], {"class": "box"})
+        stream = io.StringIO()
+        node.render_to(stream)
+        self.assertEqual(stream.getvalue(), '<div class="box"><span><i>x</i></span></div>')
+
+    def test_deep_tree_does_not_recurse(self):
+        node = LeafNode(None, "deep")
+        for _ in range(5000):
+            node = ParentNode("span", [node])
+        html = node.to_html()
+        self.assertTrue(html.startswith("<span>" * 5000 + "deep"))
+        self.assertTrue(html.endswith("</span>" * 5000))
+
+    def test_parent_without_tag(self):
+        node = ParentNode(None, [LeafNode(None, "text")])
+        with self.assertRaises(ValueError):
+            node.to_html()
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
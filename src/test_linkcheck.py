@@ -0,0 +1,69 @@
+import os
+import unittest
+
+from fixtures import TempDirTestCase, write_file
+from generate_page import generate_pages
+from linkcheck import LinkChecker, resolve_target
+
+
+class TestResolveTarget(unittest.TestCase):
+    def test_resolve_target(self):
+        self.assertEqual(resolve_target("/about.html#team", "/index.html"), "/about.html")
+        self.assertEqual(resolve_target("../images/a%20b.png", "/blog/post.html"), "/images/a b.png")
+        self.assertEqual(resolve_target("/blog/", "/index.html"), "/blog/")
+        self.assertIsNone(resolve_target("https://example.com/x", "/index.html"))
+        self.assertIsNone(resolve_target("mailto:me@example.com", "/index.html"))
+        self.assertIsNone(resolve_target("#top", "/index.html"))
+
+
+class TestLinkChecker(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.temp.name, "content")
+        self.public = os.path.join(self.temp.name, "public")
+        self.checker_path = os.path.join(self.temp.name, "cache", "links.json")
+        self.index = os.path.join(self.content, "index.md")
+        self.post = os.path.join(self.content, "blog", "index.md")
+        write_file(self.index, "# Home\n\nSee [the blog](/blog/) and [about](about.html).\n\n"
+                               "* [post](/blog/index.html)\n* ![logo](/images/logo.png)\n\n"
+                               "```\n[not a link](/nowhere.html)\n```")
+        write_file(self.post, "Back [home](../index.html) or [away](https://example.com)")
+
+    def check(self, jobs=1, static_paths=("/images/logo.png",)):
+        checker = LinkChecker.load(self.checker_path)
+        stats = generate_pages(self.content, self.public, jobs=jobs, link_checker=checker)
+        broken = checker.broken_links(static_paths)
+        checker.save()
+        return stats, broken
+
+    def test_reports_file_and_line(self):
+        stats, broken = self.check(jobs=2, static_paths=())
+        self.assertEqual(stats.links_collected, 2)
+        self.assertEqual(broken, [(self.index, 3, "about.html"), (self.index, 6, "/images/logo.png")])
+
+    def test_line_of_link_inside_block(self):
+        write_file(self.post, "Back [home](../index.html) and\n[gone](/gone.html) here\n\n"
+                              "> quoted\n> [also gone](/also-gone.html)\n\n"
+                              "* [gone](/gone.html)\n* [gone](/gone.html)")
+        stats, broken = self.check()
+        self.assertEqual(
+            [(line, target) for path, line, target in broken if path == self.post],
+            [(2, "/gone.html"), (5, "/also-gone.html"), (7, "/gone.html"), (8, "/gone.html")],
+        )
+
+    def test_only_changed_pages_are_reread(self):
+        self.check()
+        stats, broken = self.check()
+        self.assertEqual(stats.links_collected, 0)
+        self.assertEqual(broken, [(self.index, 3, "about.html")])
+
+    def test_removed_page_breaks_unchanged_links(self):
+        self.check()
+        os.remove(self.post)
+        stats, broken = self.check()
+        self.assertEqual(stats.links_collected, 0)
+        self.assertEqual([target for path, line, target in broken], ["/blog/", "about.html", "/blog/index.html"])
+
+
+if __name__ == "__main__":
+    unittest.main()
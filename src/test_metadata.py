@@ -0,0 +1,104 @@
+import os
+import unittest
+import xml.etree.ElementTree as ElementTree
+
+from assets import HashCache
+from fixtures import TempDirTestCase, write_file
+from metadata import MetadataCache, extract_metadata
+from sitemap import atom_timestamp, page_date, site_pages, write_site_files
+from split_delimiter import render_markdown
+from template import Template
+
+
+class TestExtractMetadata(unittest.TestCase):
+    def test_heading_and_first_paragraph(self):
+        metadata = extract_metadata("* list first\n\n## Sub\n\n# The *Heading*\n\nFirst **para**\ngraph.\n\nSecond.")
+        self.assertEqual(
+            (metadata["title"], metadata["heading"], metadata["summary"]),
+            ("The Heading", "Sub", "First para graph."),
+        )
+
+    def test_title_matches_page_title(self):
+        # Only an h1 is a title, for the feed as for the page's <title>
+        template = Template("{{ Title }}|{{ Content }}")
+        for markdown in ("## Sub\n\nBody", "## Sub\n\n# Main\n\nBody", "Body\n\n" * 8 + "# Late"):
+            page_title = render_markdown(markdown, template).split("|")[0]
+            self.assertEqual(extract_metadata(markdown)["title"], page_title)
+
+    def test_front_matter(self):
+        metadata = extract_metadata('---\ntitle: "Custom: title"\ndate: 2024-05-01\n---\n\n# Heading\n\nBody')
+        self.assertEqual(metadata["title"], "Custom: title")
+        self.assertEqual(metadata["heading"], "Heading")
+        self.assertEqual(metadata["date"], "2024-05-01")
+
+    def test_stops_after_what_it_needs(self):
+        # An unclosed delimiter further down would raise if it were parsed
+        metadata = extract_metadata("# Title\n\nSummary\n\nbroken **markdown")
+        self.assertEqual(metadata["summary"], "Summary")
+
+
+class TestDates(unittest.TestCase):
+    def page(self, date):
+        return {"date": date, "source_path": __file__}
+
+    def test_front_matter_dates_are_normalised(self):
+        self.assertEqual(atom_timestamp(page_date(self.page("2024-05-01"))), "2024-05-01T00:00:00Z")
+        self.assertEqual(atom_timestamp(page_date(self.page("2024-05-01T10:30:00+02:00"))), "2024-05-01T08:30:00Z")
+        self.assertEqual(atom_timestamp(page_date(self.page("2024-05-01 10:30"))), "2024-05-01T10:30:00Z")
+
+    def test_invalid_date_falls_back_to_mtime(self):
+        mtime = atom_timestamp(page_date(self.page("")))
+        self.assertEqual(atom_timestamp(page_date(self.page("May 1st <b>"))), mtime)
+
+
+class TestSiteFiles(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.temp.name, "content")
+        self.public = os.path.join(self.temp.name, "public")
+        write_file(os.path.join(self.content, "index.md"), "# Home\n\nWelcome & hello")
+        write_file(os.path.join(self.content, "blog", "post.md"),
+                   "---\ndate: 2024-05-01\nauthor: Ada\n---\n\n# Post\n\nNews")
+
+    def cache(self):
+        cache_directory = os.path.join(self.temp.name, "cache")
+        return MetadataCache.load(os.path.join(cache_directory, "metadata.json"),
+                                  HashCache.load(os.path.join(cache_directory, "hashes.json")))
+
+    def build(self):
+        cache = self.cache()
+        pages = site_pages(self.content, self.public, cache)
+        changed = write_site_files(pages, self.public, "https://example.com/", "Example")
+        cache.save()
+        return cache, changed
+
+    def test_sitemap_and_feed(self):
+        cache, changed = self.build()
+        self.assertEqual(cache.extracted, 2)
+        self.assertEqual(len(changed), 2)
+        namespace = {"sm": "http://www.sitemaps.org/schemas/sitemap/0.9", "atom": "http://www.w3.org/2005/Atom"}
+        sitemap = ElementTree.parse(os.path.join(self.public, "sitemap.xml"))
+        self.assertEqual(
+            [loc.text for loc in sitemap.findall("sm:url/sm:loc", namespace)],
+            ["https://example.com/blog/post.html", "https://example.com/index.html"],
+        )
+        feed = ElementTree.parse(os.path.join(self.public, "feed.xml"))
+        entries = feed.findall("atom:entry", namespace)
+        self.assertEqual(len(entries), 2)
+        summaries = [entry.find("atom:summary", namespace).text for entry in entries]
+        self.assertIn("Welcome & hello", summaries)
+        self.assertEqual(feed.find("atom:author/atom:name", namespace).text, "Example")
+        authors = [entry.findtext("atom:author/atom:name", None, namespace) for entry in entries]
+        self.assertEqual(authors, [None, "Ada"])
+
+    def test_unchanged_pages_come_from_cache(self):
+        self.build()
+        cache, changed = self.build()
+        self.assertEqual((cache.extracted, changed), (0, []))
+        write_file(os.path.join(self.content, "index.md"), "# Home again\n\nWelcome")
+        cache, changed = self.build()
+        self.assertEqual(cache.extracted, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
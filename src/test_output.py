@@ -0,0 +1,72 @@
+import json
+import os
+import unittest
+
+from fixtures import TempDirTestCase, write_file
+from output import same_content, write_if_changed, write_json_atomic, write_manifest
+
+
+class TestWriteIfChanged(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dest = os.path.join(self.temp.name, "public", "index.html")
+        write_file(self.dest, "<p>old</p>")
+        stat = os.stat(self.dest)
+        self.old_mtime = stat.st_mtime_ns - 10**9
+        os.utime(self.dest, ns=(stat.st_atime_ns, self.old_mtime))
+
+    def write(self, content):
+        def writer(path):
+            write_file(path, content)
+            return "done"
+        return write_if_changed(self.dest, writer)
+
+    def test_identical_write_is_skipped(self):
+        self.assertEqual(self.write("<p>old</p>"), ("done", False))
+        self.assertEqual(os.stat(self.dest).st_mtime_ns, self.old_mtime)
+        self.assertEqual(os.listdir(os.path.dirname(self.dest)), ["index.html"])
+
+    def test_same_size_different_bytes(self):
+        self.assertEqual(self.write("<p>new</p>"), ("done", True))
+        with open(self.dest) as f:
+            self.assertEqual(f.read(), "<p>new</p>")
+
+    def test_missing_destination(self):
+        os.remove(self.dest)
+        self.assertEqual(self.write("<p>new</p>"), ("done", True))
+
+    def test_failed_write_keeps_old_file(self):
+        def writer(path):
+            write_file(path, "<p>half")
+            raise RuntimeError("render failed")
+        with self.assertRaises(RuntimeError):
+            write_if_changed(self.dest, writer)
+        self.assertEqual(os.listdir(os.path.dirname(self.dest)), ["index.html"])
+        with open(self.dest) as f:
+            self.assertEqual(f.read(), "<p>old</p>")
+
+    def test_same_content(self):
+        other = os.path.join(self.temp.name, "other.html")
+        write_file(other, "<p>old</p>")
+        self.assertTrue(same_content(self.dest, other))
+        self.assertFalse(same_content(self.dest, os.path.join(self.temp.name, "missing.html")))
+
+    def test_write_manifest(self):
+        public = os.path.join(self.temp.name, "public")
+        manifest_path = os.path.join(self.temp.name, "cache", "changes.json")
+        write_manifest(manifest_path, public, [os.path.join(public, "b.html"), os.path.join(public, "a", "c.css")],
+                       [os.path.join(public, "old.html")])
+        with open(manifest_path) as f:
+            self.assertEqual(json.load(f), {"changed": ["a/c.css", "b.html"], "removed": ["old.html"]})
+
+    def test_write_json_atomic(self):
+        path = os.path.join(self.temp.name, "cache", "state.json")
+        write_json_atomic(path, {"b": 1, "a": [2]})
+        write_json_atomic(path, {"c": 3})
+        with open(path) as f:
+            self.assertEqual(json.load(f), {"c": 3})
+        self.assertEqual(os.listdir(os.path.dirname(path)), ["state.json"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import os
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import corpus
+import linkcheck
+import profiler
+import search
+from fixtures import TempDirTestCase, read_file, write_file
+from generate_page import bounded_map, generate_pages, markdown_file_to_html_parallel
+from split_delimiter import markdown_file_to_html
+from template import Template
+
+PAGE = """---
+title: "Front matter title"
+---
+
+# Big page
+
+First paragraph with a [link](/missing.html) and **bold** text.
+
+* one
+* two [second](/other.html)
+
+```
+code `block`
+```
+
+> quoted ![image](/images/logo.png)
+
+Last paragraph
+"""
+
+
+class TestParallelBlocks(TempDirTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.executor = ProcessPoolExecutor(max_workers=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.executor.shutdown()
+
+    def setUp(self):
+        super().setUp()
+        self.source = os.path.join(self.temp.name, "page.md")
+        write_file(self.source, PAGE)
+
+    def render_both(self, template=None, chunk_bytes=16):
+        serial = os.path.join(self.temp.name, "serial.html")
+        parallel = os.path.join(self.temp.name, "parallel.html")
+        markdown_file_to_html(self.source, serial, template)
+        markdown_file_to_html_parallel(self.source, parallel, template, self.executor, chunk_bytes)
+        return read_file(serial), read_file(parallel)
+
+    def test_matches_serial_output(self):
+        for chunk_bytes in (1, 16, 64, 1024 * 1024):
+            serial, parallel = self.render_both(chunk_bytes=chunk_bytes)
+            self.assertEqual(parallel, serial)
+
+    def test_matches_serial_output_with_template(self):
+        template = Template("<title>{{ Title }}</title><body>{{ Content }}</body>")
+        serial, parallel = self.render_both(template)
+        self.assertEqual(parallel, serial)
+        self.assertIn("<title>Front matter title</title>", parallel)
+
+    def test_larger_document(self):
+        write_file(self.source, corpus.document(sections=100))
+        serial, parallel = self.render_both(chunk_bytes=4096)
+        self.assertEqual(parallel, serial)
+
+    def test_empty_file(self):
+        write_file(self.source, "")
+        serial, parallel = self.render_both()
+        self.assertEqual(parallel, serial)
+
+    def test_parse_error_reaches_caller(self):
+        write_file(self.source, PAGE + "\nplain **bold\n")
+        with self.assertRaisesRegex(ValueError, "not closed"):
+            markdown_file_to_html_parallel(self.source, os.path.join(self.temp.name, "page.html"),
+                                           executor=self.executor, chunk_bytes=16)
+
+    def test_collects_terms_and_link_lines(self):
+        dest = os.path.join(self.temp.name, "page.html")
+        with search.collecting() as serial_fragments, linkcheck.collecting() as serial_links:
+            markdown_file_to_html(self.source, dest)
+        with search.collecting() as fragments, linkcheck.collecting() as page_links:
+            markdown_file_to_html_parallel(self.source, dest, executor=self.executor, chunk_bytes=16)
+        self.assertEqual(search.page_terms(fragments), search.page_terms(serial_fragments))
+        self.assertEqual(page_links.links, serial_links.links)
+        self.assertIn(["/missing.html", 7], page_links.links)
+        self.assertIn(["/other.html", 10], page_links.links)
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(max_workers=2)
+        self.submitted = 0
+        self.most_ahead = 0
+        self.consumed = 0
+
+    def submit(self, func, *args):
+        self.submitted += 1
+        self.most_ahead = max(self.most_ahead, self.submitted - self.consumed)
+        return super().submit(func, *args)
+
+
+class TestBoundedMap(unittest.TestCase):
+    def test_limits_tasks_in_flight(self):
+        with CountingExecutor() as executor:
+            results = []
+            for result in bounded_map(executor, pow, 3, range(20), range(20, 40)):
+                executor.consumed += 1
+                results.append(result)
+        self.assertEqual(results, [pow(a, b) for a, b in zip(range(20), range(20, 40))])
+        self.assertEqual(executor.most_ahead, 3)
+
+
+class TestGenerateHugePages(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.temp.name, "content")
+        write_file(os.path.join(self.content, "huge.md"), corpus.document(sections=50))
+        write_file(os.path.join(self.content, "small.md"), "# Small\n\nTiny page")
+
+    def test_threshold_splits_huge_pages(self):
+        serial = os.path.join(self.temp.name, "serial")
+        parallel = os.path.join(self.temp.name, "parallel")
+        generate_pages(self.content, serial, jobs=1)
+        stats = generate_pages(self.content, parallel, jobs=2, parallel_threshold=1024)
+        self.assertEqual(stats.rendered, 2)
+        self.assertEqual(sorted(stats.changed), [os.path.join(parallel, "huge.html"), os.path.join(parallel, "small.html")])
+        for name in ("huge.html", "small.html"):
+            self.assertEqual(read_file(os.path.join(parallel, name)), read_file(os.path.join(serial, name)))
+
+    def test_profile_includes_huge_pages(self):
+        profile = profiler.enable()
+        try:
+            generate_pages(self.content, os.path.join(self.temp.name, "public"), jobs=2, parallel_threshold=1024)
+        finally:
+            profiler.disable()
+        huge = profile.pages[os.path.join(self.content, "huge.md")]
+        self.assertGreater(huge["seconds"], 0)
+        self.assertIn("block_build", huge["stages"])
+        self.assertGreater(profile.stages["block_build"]["calls"], 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import asyncio
+import os
+import unittest
+
+from fixtures import TempDirTestCase, write_file
+from generate_page import generate_pages
+from pipeline import MemoryBudget
+from render_cache import RenderCache
+from search import SearchIndex
+
+
+def read_tree(directory):
+    files = {}
+    for root, dirs, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            with open(path) as f:
+                files[os.path.relpath(path, directory)] = f.read()
+    return files
+
+
+class TestMemoryBudget(unittest.TestCase):
+    def test_waits_for_release(self):
+        async def run():
+            budget = MemoryBudget(100)
+            await budget.acquire(60)
+            waiter = asyncio.create_task(budget.acquire(60))
+            await asyncio.sleep(0)
+            self.assertFalse(waiter.done())
+            await budget.release(60)
+            await waiter
+            # Larger than the whole budget, but alone once the rest is released
+            oversized = asyncio.create_task(budget.acquire(500))
+            await asyncio.sleep(0)
+            self.assertFalse(oversized.done())
+            await budget.release(60)
+            await oversized
+            return budget.peak
+
+        self.assertEqual(asyncio.run(run()), 500)
+
+
+class EvictingCache(RenderCache):
+    # Every entry disappears between the read's lookup and the write's fetch
+    def fetch(self, key, dest_path):
+        os.remove(self.entry_path(key))
+        return super().fetch(key, dest_path)
+
+
+class TestPipeline(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.temp.name, "content")
+        self.template_path = os.path.join(self.temp.name, "template.html")
+        write_file(self.template_path, "<title>{{ Title }}</title>{{ Content }}")
+        for i in range(12):
+            write_file(os.path.join(self.content, f"dir{i % 3}", f"page{i}.md"),
+                       f"# Page {i}\n\nSome **bold** text {i}\n\n* one\n* [two](/dir0/page0.html)")
+        write_file(os.path.join(self.content, "empty.md"), "")
+
+    def build(self, name, **kwargs):
+        public = os.path.join(self.temp.name, name)
+        stats = generate_pages(self.content, public, template_path=self.template_path, **kwargs)
+        return stats, read_tree(public)
+
+    def test_matches_regular_build(self):
+        expected = self.build("regular", jobs=1)[1]
+        self.assertEqual(self.build("serial", jobs=1, pipeline=True)[1], expected)
+        stats, files = self.build("parallel", jobs=3, pipeline=True, memory_budget=200)
+        self.assertEqual(files, expected)
+        self.assertEqual((stats.rendered, len(stats.changed)), (13, 13))
+
+    def test_render_cache_and_search(self):
+        cache = RenderCache(os.path.join(self.temp.name, "cache"))
+        self.build("first", jobs=2, pipeline=True, cache=cache)
+        index = SearchIndex(os.path.join(self.temp.name, "index.json"))
+        stats, files = self.build("second", jobs=2, pipeline=True, cache=cache, search_index=index)
+        self.assertEqual((stats.cache_hits, stats.indexed), (13, 13))
+        self.assertEqual(files["dir1/page4.html"], "<title>Page 4</title><div><h1>Page 4</h1><p>Some <b>bold</b> text 4</p>"
+                                                   '<ul><li>one</li><li><a href="/dir0/page0.html">two</a></li></ul></div>')
+        self.assertIn("bold", index.pages["/dir1/page4.html"]["terms"])
+
+    def test_evicted_entries_render_again(self):
+        expected = self.build("regular", jobs=1)[1]
+        cache_directory = os.path.join(self.temp.name, "cache")
+        self.build("first", jobs=1, pipeline=True, cache=RenderCache(cache_directory))
+        index = SearchIndex(os.path.join(self.temp.name, "index.json"))
+        stats, files = self.build("second", jobs=1, pipeline=True, cache=EvictingCache(cache_directory),
+                                  search_index=index)
+        self.assertEqual(files, expected)
+        self.assertEqual((stats.cache_hits, stats.indexed), (0, 13))
+        self.assertIn("4", index.pages["/dir1/page4.html"]["terms"])
+        self.assertNotIn("5", index.pages["/dir1/page4.html"]["terms"])
+
+
+if __name__ == "__main__":
+    unittest.main()
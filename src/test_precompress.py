@@ -0,0 +1,107 @@
+import gzip
+import os
+import random
+import unittest
+from unittest import mock
+
+import precompress as precompress_module
+from fixtures import TempDirTestCase, write_file
+from precompress import precompress
+
+
+class TestPrecompress(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.public = os.path.join(self.temp.name, "public")
+        self.state_path = os.path.join(self.temp.name, "cache", "precompress.json")
+        write_file(os.path.join(self.public, "index.html"), "<p>hello</p>" * 500)
+        write_file(os.path.join(self.public, "blog", "post.html"), "<p>post</p>" * 500)
+        write_file(os.path.join(self.public, "index.css"), "body {}")
+        write_file(os.path.join(self.public, "images", "logo.png"), "png" * 1000)
+
+    def path(self, rel_path):
+        return os.path.join(self.public, rel_path)
+
+    def precompress(self, **kwargs):
+        return precompress(self.public, state_path=self.state_path, **kwargs)
+
+    def test_compresses_large_text_files(self):
+        stats = self.precompress(jobs=2)
+        self.assertEqual((stats.compressed, stats.skipped, stats.too_small), (2, 0, 1))
+        self.assertGreater(stats.bytes_saved(), 0)
+        with gzip.open(self.path("index.html.gz"), "rt") as f:
+            self.assertEqual(f.read(), "<p>hello</p>" * 500)
+        self.assertFalse(os.path.exists(self.path("index.css.gz")))
+        self.assertFalse(os.path.exists(self.path("images/logo.png.gz")))
+
+    def test_up_to_date_siblings_are_skipped(self):
+        self.precompress()
+        stats = self.precompress()
+        self.assertEqual((stats.compressed, stats.skipped), (0, 2))
+
+    def test_up_to_date_build_reports_total_bytes_saved(self):
+        self.precompress()
+        stats = self.precompress()
+        self.assertEqual(stats.compressed, 0)
+        saved = sum(
+            os.path.getsize(self.path(rel_path)) - os.path.getsize(self.path(rel_path + ".gz"))
+            for rel_path in ("index.html", "blog/post.html")
+        )
+        self.assertEqual(stats.bytes_saved(), saved)
+
+    def test_incompressible_file_is_not_retried(self):
+        rng = random.Random(0)
+        with open(self.path("noise.txt"), "wb") as f:
+            f.write(bytes(rng.randrange(256) for _ in range(2000)))
+        self.precompress()
+        self.assertFalse(os.path.exists(self.path("noise.txt.gz")))
+        with mock.patch.object(precompress_module, "compress_file", wraps=precompress_module.compress_file) as compress:
+            stats = self.precompress()
+        self.assertEqual(compress.call_count, 0)
+        self.assertEqual((stats.compressed, stats.skipped), (0, 3))
+
+    def test_changed_file_with_older_mtime_is_recompressed(self):
+        # A hardlinked copy keeps its source's mtime, which can be older
+        # than the .gz made from the previous version
+        self.precompress()
+        stat = os.stat(self.path("index.html"))
+        write_file(self.path("index.html"), "<p>changed</p>" * 500)
+        os.utime(self.path("index.html"), ns=(stat.st_atime_ns, stat.st_mtime_ns - 10**9))
+        stats = self.precompress()
+        self.assertEqual(stats.changed, [self.path("index.html.gz")])
+        with gzip.open(self.path("index.html.gz"), "rt") as f:
+            self.assertEqual(f.read(), "<p>changed</p>" * 500)
+
+    def test_touched_identical_file_is_not_recompressed(self):
+        self.precompress()
+        stat = os.stat(self.path("index.html"))
+        os.utime(self.path("index.html"), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        stats = self.precompress()
+        self.assertEqual((stats.compressed, stats.skipped), (0, 2))
+
+    def test_changed_file_is_recompressed(self):
+        self.precompress()
+        write_file(self.path("index.html"), "<p>changed</p>" * 500)
+        stats = self.precompress()
+        self.assertEqual((stats.compressed, stats.skipped), (1, 1))
+        self.assertEqual(stats.changed, [self.path("index.html.gz")])
+        with gzip.open(self.path("index.html.gz"), "rt") as f:
+            self.assertEqual(f.read(), "<p>changed</p>" * 500)
+
+    def test_orphaned_siblings_are_removed(self):
+        self.precompress()
+        os.remove(self.path("blog/post.html"))
+        stats = self.precompress()
+        self.assertEqual(stats.removed, [self.path("blog/post.html.gz")])
+        self.assertFalse(os.path.exists(self.path("blog/post.html.gz")))
+
+    def test_published_gz_files_are_kept(self):
+        write_file(self.path("downloads/archive.tar.gz"), "archive")
+        self.precompress()
+        stats = self.precompress()
+        self.assertEqual(stats.removed, [])
+        self.assertTrue(os.path.exists(self.path("downloads/archive.tar.gz")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import unittest
+
+import profiler
+from fixtures import TempDirTestCase, write_file
+from generate_page import generate_pages
+from split_delimiter import markdown_to_html_node
+
+
+class TestProfiler(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.temp.name, "content")
+        self.public = os.path.join(self.temp.name, "public")
+        for i in range(4):
+            write_file(os.path.join(self.content, f"page{i}.md"), f"# Page {i}\n\nSome **text** here")
+
+    def tearDown(self):
+        profiler.disable()
+
+    def test_off_by_default(self):
+        self.assertIsNone(profiler.PROFILER)
+        with profiler.timed_stage("nothing"):
+            markdown_to_html_node("# Quiet")
+        self.assertIsNone(profiler.PROFILER)
+
+    def test_serial_build_records_stages_and_pages(self):
+        profile = profiler.enable()
+        with profiler.timed_stage("build"):
+            generate_pages(self.content, self.public, jobs=1)
+        self.assertEqual(profile.stages["page"]["calls"], 4)
+        self.assertEqual(profile.stages["block_build"]["calls"], 8)
+        self.assertEqual(profile.stages["inline_parse"]["bytes_in"], 4 * len("Page 0") + 4 * len("Some **text** here"))
+        self.assertEqual(profile.stages["build"]["calls"], 1)
+        self.assertEqual(len(profile.slowest_pages(2)), 2)
+        self.assertIn("block_split", profile.pages[os.path.join(self.content, "page0.md")]["stages"])
+
+    def test_parallel_build_merges_worker_numbers(self):
+        profile = profiler.enable()
+        generate_pages(self.content, self.public, jobs=2)
+        self.assertEqual(profile.stages["page"]["calls"], 4)
+        self.assertEqual(len(profile.pages), 4)
+
+    def test_pipeline_records_stages_and_pages(self):
+        for jobs in (1, 2):
+            profile = profiler.enable()
+            generate_pages(self.content, os.path.join(self.public, str(jobs)), jobs=jobs, pipeline=True)
+            self.assertEqual(profile.stages["page"]["calls"], 4)
+            self.assertEqual(profile.stages["block_build"]["calls"], 8)
+            self.assertEqual(len(profile.slowest_pages(10)), 4)
+            stages = profile.pages[os.path.join(self.content, "page0.md")]["stages"]
+            self.assertIn("pipeline_read", stages)
+            self.assertIn("inline_parse", stages)
+            profiler.disable()
+
+    def test_report_table(self):
+        profile = profiler.enable()
+        generate_pages(self.content, self.public, jobs=1)
+        table = profile.format_table(2)
+        self.assertIn("inline_parse", table)
+        self.assertIn("slowest pages", table)
+
+
+if __name__ == "__main__":
+    unittest.main()
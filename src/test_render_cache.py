@@ -0,0 +1,56 @@
+import os
+import time
+import unittest
+
+from fixtures import TempDirTestCase, write_file
+from generate_page import generate_pages
+from render_cache import RenderCache
+
+
+class TestRenderCache(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = RenderCache(os.path.join(self.temp.name, "cache"))
+        self.source = os.path.join(self.temp.name, "page.md")
+        self.rendered = os.path.join(self.temp.name, "page.html")
+        write_file(self.source, "# Page")
+        write_file(self.rendered, "<div><h1>Page</h1></div>")
+
+    def test_store_and_fetch(self):
+        key = self.cache.key(self.source)
+        dest_path = os.path.join(self.temp.name, "out.html")
+        self.assertFalse(self.cache.fetch(key, dest_path))
+        self.cache.store(key, self.rendered)
+        self.assertTrue(self.cache.fetch(key, dest_path))
+        with open(dest_path) as f:
+            self.assertEqual(f.read(), "<div><h1>Page</h1></div>")
+
+    def test_key_covers_template(self):
+        self.assertNotEqual(self.cache.key(self.source), self.cache.key(self.source, "<html>{{ Content }}</html>"))
+
+    def test_evict_least_recently_used(self):
+        self.cache.store("aa" + "0" * 62, self.rendered)
+        self.cache.store("bb" + "0" * 62, self.rendered)
+        old_time = time.time() - 100
+        os.utime(self.cache.entry_path("aa" + "0" * 62), (old_time, old_time))
+        self.cache.max_bytes = os.path.getsize(self.rendered)
+        self.assertEqual(self.cache.evict(), 1)
+        self.assertFalse(os.path.exists(self.cache.entry_path("aa" + "0" * 62)))
+        self.assertTrue(os.path.exists(self.cache.entry_path("bb" + "0" * 62)))
+
+    def test_generate_pages_hits_cache(self):
+        content = os.path.join(self.temp.name, "content")
+        public = os.path.join(self.temp.name, "public")
+        write_file(os.path.join(content, "a.md"), "# A")
+        write_file(os.path.join(content, "b.md"), "# B")
+        first = generate_pages(content, public, jobs=1, cache=self.cache)
+        self.assertEqual((first.cache_hits, first.cache_misses), (0, 2))
+        write_file(os.path.join(content, "b.md"), "# B changed")
+        second = generate_pages(content, public, jobs=2, cache=self.cache)
+        self.assertEqual((second.cache_hits, second.cache_misses), (1, 1))
+        with open(os.path.join(public, "b.html")) as f:
+            self.assertEqual(f.read(), "<div><h1>B changed</h1></div>")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import json
+import os
+import unittest
+
+from fixtures import TempDirTestCase, write_file
+from generate_page import generate_pages
+from search import SearchIndex, page_terms
+
+
+def read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+class TestPageTerms(unittest.TestCase):
+    def test_positions(self):
+        self.assertEqual(
+            page_terms(["Fast static", "site, fast builds"]),
+            {"fast": [0, 3], "static": [1], "site": [2], "builds": [4]},
+        )
+
+
+class TestSearchIndex(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.temp.name, "content")
+        self.public = os.path.join(self.temp.name, "public")
+        self.index_path = os.path.join(self.temp.name, "cache", "search-index.json")
+        write_file(os.path.join(self.content, "index.md"), "# Home\n\nWelcome **home**, reader")
+        write_file(os.path.join(self.content, "blog", "post.md"), "* Hello [reader](/index.html)\n* bye")
+
+    def build(self, jobs=1):
+        index = SearchIndex.load(self.index_path)
+        stats = generate_pages(self.content, self.public, jobs=jobs, search_index=index)
+        changed, removed = index.write_shards(self.public)
+        index.save()
+        return stats, changed, removed
+
+    def shard(self, prefix):
+        return read_json(os.path.join(self.public, "search", f"{prefix}.json"))
+
+    def test_shards_by_prefix(self):
+        stats, changed, removed = self.build(jobs=2)
+        self.assertEqual(stats.indexed, 2)
+        pages = read_json(os.path.join(self.public, "search", "pages.json"))
+        ids = {url: page_id for page_id, url in pages.items()}
+        self.assertEqual(set(ids), {"/index.html", "/blog/post.html"})
+        self.assertEqual(self.shard("re")["reader"], {ids["/index.html"]: [3], ids["/blog/post.html"]: [1]})
+        self.assertEqual(self.shard("ho")["home"], {ids["/index.html"]: [0, 2]})
+
+    def test_only_changed_pages_are_reindexed(self):
+        self.build()
+        stats, changed, removed = self.build()
+        self.assertEqual((stats.indexed, changed), (0, []))
+        write_file(os.path.join(self.content, "blog", "post.md"), "Goodbye")
+        stats, changed, removed = self.build()
+        self.assertEqual(stats.indexed, 1)
+        self.assertIn(os.path.join(self.public, "search", "go.json"), changed)
+        self.assertIn(os.path.join(self.public, "search", "he.json"), removed)
+        index_id = str(read_json(self.index_path)["pages"]["/index.html"]["id"])
+        self.assertEqual(list(self.shard("re")["reader"]), [index_id])
+
+    def test_removed_page_empties_its_shards(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        stats, changed, removed = self.build()
+        self.assertIn(os.path.join(self.public, "search", "by.json"), removed)
+        self.assertEqual(list(read_json(os.path.join(self.public, "search", "pages.json")).values()), ["/index.html"])
+
+    def test_cache_hits_are_still_indexed(self):
+        from render_cache import RenderCache
+        cache = RenderCache(os.path.join(self.temp.name, "cache", "render"))
+        generate_pages(self.content, self.public, jobs=1, cache=cache)
+        index = SearchIndex.load(self.index_path)
+        stats = generate_pages(self.content, self.public, jobs=1, cache=cache, search_index=index)
+        self.assertEqual((stats.cache_hits, stats.indexed), (2, 2))
+        self.assertIn("welcome", index.pages["/index.html"]["terms"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import io
+import os
+import random
+import tempfile
+import tracemalloc
+import unittest
+
+import corpus
+
+from split_delimiter import TITLE_LOOKAHEAD, markdown_file_to_html
+from template import Template, load_template
+
+
+class TestTemplate(unittest.TestCase):
+    def test_segments(self):
+        template = Template("<title>{{ Title }}</title><body>{{Content}}</body>")
+        self.assertEqual(template.segments, [
+            ("text", "<title>"), ("slot", "Title"), ("text", "</title><body>"),
+            ("slot", "Content"), ("text", "</body>"),
+        ])
+
+    def test_render_to(self):
+        template = Template("{{ Title }}|{{ Content }}|{{ Title }}")
+        stream = io.StringIO()
+        template.render_to(stream, "Home", lambda out: out.write("<div></div>"))
+        self.assertEqual(stream.getvalue(), "Home|<div></div>|Home")
+
+    def test_unknown_slot(self):
+        with self.assertRaises(ValueError):
+            Template("{{ Author }}")
+
+    def test_two_content_slots(self):
+        with self.assertRaises(ValueError):
+            Template("{{ Content }}{{ Content }}")
+
+    def test_load_template_reuses_until_changed(self):
+        with tempfile.TemporaryDirectory() as temp:
+            path = os.path.join(temp, "template.html")
+            with open(path, "w") as f:
+                f.write("<p>{{ Content }}</p>")
+            first = load_template(path)
+            self.assertIs(load_template(path), first)
+            with open(path, "w") as f:
+                f.write("<section>{{ Content }}</section>")
+            self.assertEqual(load_template(path).source, "<section>{{ Content }}</section>")
+
+
+class TestTemplatedPage(unittest.TestCase):
+    def render(self, markdown):
+        with tempfile.TemporaryDirectory() as temp:
+            source_path = os.path.join(temp, "page.md")
+            dest_path = os.path.join(temp, "page.html")
+            with open(source_path, "w") as f:
+                f.write(markdown)
+            markdown_file_to_html(source_path, dest_path, Template("<title>{{ Title }}</title>{{ Content }}"))
+            with open(dest_path) as f:
+                return f.read()
+
+    def test_title_from_first_h1(self):
+        self.assertEqual(
+            self.render("Intro\n\n## Sub\n\n# Real title\n\nBody"),
+            "<title>Real title</title><div><p>Intro</p><h2>Sub</h2><h1>Real title</h1><p>Body</p></div>",
+        )
+
+    def test_title_is_plain_text(self):
+        self.assertEqual(
+            self.render("# Hello *there* [you](/you)"),
+            "<title>Hello there you</title><div><h1>Hello <i>there</i> <a href=\"/you\">you</a></h1></div>",
+        )
+
+    def test_front_matter_is_not_content(self):
+        self.assertEqual(
+            self.render("---\ntitle: Custom\n---\n\n# Heading\n\nBody"),
+            "<title>Custom</title><div><h1>Heading</h1><p>Body</p></div>",
+        )
+
+    def test_no_h1(self):
+        self.assertEqual(self.render("* one"), "<title></title><div><ul><li>one</li></ul></div>")
+
+    def test_late_h1_is_not_the_title(self):
+        markdown = "\n\n".join(["Filler"] * TITLE_LOOKAHEAD + ["# Too late"])
+        self.assertTrue(self.render(markdown).startswith("<title></title><div><p>Filler</p>"))
+
+    def test_memory_without_h1_does_not_grow_with_page(self):
+        rng = random.Random(2)
+        with tempfile.TemporaryDirectory() as temp:
+            source_path = os.path.join(temp, "page.md")
+            with open(source_path, "w") as f:
+                f.write("\n\n".join(corpus.long_paragraph(rng, 10) for _ in range(200)))
+            template = Template("<title>{{ Title }}</title>{{ Content }}")
+            tracemalloc.start()
+            try:
+                markdown_file_to_html(source_path, os.path.join(temp, "page.html"), template)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            self.assertLess(peak, os.path.getsize(source_path) // 2)
+
+    def test_empty_file(self):
+        self.assertEqual(self.render(""), "<title></title><div></div>")
+
+
+if __name__ == "__main__":
+    unittest.main()
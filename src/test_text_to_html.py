@@ -1,5 +1,5 @@
 from textnode import TextNode, TextType
-from text_to_html import text_node_to_html_node
+from text_to_html import set_url_rewriter, text_node_to_html_node
 
 def test_text_node_to_html():
     node = TextNode("Hello World!", TextType.TEXT)
@@ -49,4 +49,13 @@ def test_invalid_node_to_html():
         text_node_to_html_node(node)
         assert False, "Expected an exception"
     except Exception:
-        assert True
\ No newline at end of file
+        assert True
+
+def test_url_rewriter():
+    set_url_rewriter(lambda url: url.replace(".png", ".abc.png"))
+    try:
+        node = TextNode("logo", TextType.IMAGE, "/logo.png")
+        assert text_node_to_html_node(node).props["src"] == "/logo.abc.png"
+    finally:
+        set_url_rewriter(None)
+    assert text_node_to_html_node(node).props["src"] == "/logo.png"
@@ -30,6 +30,11 @@ class TestTextNode(unittest.TestCase):
             "TextNode(This is a text node, text, https://www.boot.dev)", repr(node)
         )
 
+    def test_no_instance_dict(self):
+        node = TextNode("This is a text node", TextType.TEXT)
+        with self.assertRaises(AttributeError):
+            node.extra = "nope"
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
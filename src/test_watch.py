@@ -0,0 +1,81 @@
+import os
+import threading
+import time
+import unittest
+import urllib.request
+
+from fixtures import TempDirTestCase, write_file
+from watch import changed_paths, serve, snapshot, watch
+
+
+class TestWatch(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.temp.name, "content")
+        write_file(os.path.join(self.content, "index.md"), "# Home")
+
+    def test_changed_paths(self):
+        before = snapshot([self.content, os.path.join(self.temp.name, "missing")])
+        write_file(os.path.join(self.content, "new.md"), "# New")
+        os.remove(os.path.join(self.content, "index.md"))
+        after = snapshot([self.content])
+        self.assertEqual(
+            changed_paths(before, after),
+            {os.path.join(self.content, "new.md"), os.path.join(self.content, "index.md")},
+        )
+
+    def test_burst_of_changes_rebuilds_once(self):
+        stop_event = threading.Event()
+        rebuilds = []
+
+        def rebuild(changed):
+            rebuilds.append(changed)
+            stop_event.set()
+
+        thread = threading.Thread(target=watch, args=([self.content], rebuild, 0.02, 0.1, stop_event))
+        thread.start()
+        time.sleep(0.1)  # let the watcher take its first snapshot
+        for i in range(3):
+            write_file(os.path.join(self.content, f"page{i}.md"), "# Page")
+        thread.join(timeout=5)
+        stop_event.set()
+        self.assertEqual(len(rebuilds), 1)
+        self.assertEqual(len(rebuilds[0]), 3)
+
+    def test_failed_rebuild_keeps_watching(self):
+        stop_event = threading.Event()
+        rebuilds = []
+
+        def rebuild(changed):
+            rebuilds.append(changed)
+            if len(rebuilds) == 1:
+                raise ValueError("invalid markdown, formatted section not closed")
+            stop_event.set()
+
+        thread = threading.Thread(target=watch, args=([self.content], rebuild, 0.02, 0.05, stop_event))
+        thread.start()
+        time.sleep(0.1)
+        write_file(os.path.join(self.content, "index.md"), "# Home **")
+        deadline = time.monotonic() + 5
+        while not rebuilds and time.monotonic() < deadline:
+            time.sleep(0.02)
+        write_file(os.path.join(self.content, "index.md"), "# Home **fixed**")
+        thread.join(timeout=5)
+        stop_event.set()
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(len(rebuilds), 2)
+
+    def test_serve(self):
+        write_file(os.path.join(self.temp.name, "public", "index.html"), "<p>hi</p>")
+        server = serve(os.path.join(self.temp.name, "public"), 0)
+        try:
+            port = server.server_address[1]
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/index.html") as response:
+                self.assertEqual(response.read(), b"<p>hi</p>")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,24 +1,40 @@
-from htmlnode import HTMLNode, LeafNode
+from htmlnode import EMPTY_PROPS, HTMLNode, LeafNode
 from textnode import TextNode, TextType
 
+# Link and image URLs pass through this as they render; assets installs
+# its fingerprint map's lookup here. None leaves URLs as written.
+URL_REWRITER = None
+
+
+def set_url_rewriter(rewriter):
+    global URL_REWRITER
+    URL_REWRITER = rewriter
+
+
+def rewrite_url(url):
+    if URL_REWRITER is None:
+        return url
+    return URL_REWRITER(url)
+
+
 def text_node_to_html_node(text_node):
     if text_node.text_type == TextType.TEXT:
-        return LeafNode(None, text_node.text)
+        return LeafNode(None, text_node.text, EMPTY_PROPS)
 
     elif text_node.text_type ==TextType.BOLD:
-        return LeafNode("b", text_node.text)
+        return LeafNode("b", text_node.text, EMPTY_PROPS)
     
     elif text_node.text_type == TextType.ITALIC:
-        return LeafNode("i", text_node.text)
+        return LeafNode("i", text_node.text, EMPTY_PROPS)
     
     elif text_node.text_type == TextType.CODE:
-        return LeafNode("code", text_node.text)
+        return LeafNode("code", text_node.text, EMPTY_PROPS)
     
     elif text_node.text_type == TextType.LINK:
-        return LeafNode("a", text_node.text, {"href": text_node.url})
+        return LeafNode("a", text_node.text, {"href": rewrite_url(text_node.url)})
     
     elif text_node.text_type == TextType.IMAGE:
-        return LeafNode("img", "", {"src": text_node.url, "alt": text_node.text})
+        return LeafNode("img", "", {"src": rewrite_url(text_node.url), "alt": text_node.text})
 
     else:
         raise Exception("Invalid Text")
\ No newline at end of file
@@ -0,0 +1,70 @@
+import functools
+import http.server
+import os
+import threading
+import time
+
+from copystatic import scan_tree
+
+
+def snapshot(directories):
+    stamps = {}
+    for directory in directories:
+        if os.path.isfile(directory):
+            stat = os.stat(directory)
+            stamps[directory] = (stat.st_size, stat.st_mtime_ns)
+            continue
+        if not os.path.isdir(directory):
+            continue
+        for rel_path, dir_entry in scan_tree(directory):
+            stat = dir_entry.stat()
+            stamps[os.path.join(directory, rel_path)] = (stat.st_size, stat.st_mtime_ns)
+    return stamps
+
+
+def changed_paths(old_snapshot, new_snapshot):
+    changed = set(path for path, stamp in new_snapshot.items() if old_snapshot.get(path) != stamp)
+    changed.update(path for path in old_snapshot if path not in new_snapshot)
+    return changed
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(directory, port):
+    handler = functools.partial(QuietHandler, directory=directory)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def watch(directories, rebuild, interval=0.2, debounce=0.3, stop_event=None):
+    # Polls stat snapshots and calls rebuild(changed_paths) once a burst of
+    # edits has been quiet for `debounce` seconds, so saving ten files at
+    # once costs one rebuild instead of ten.
+    if stop_event is None:
+        stop_event = threading.Event()
+    previous = snapshot(directories)
+    pending = set()
+    last_change = 0.0
+    while not stop_event.wait(interval):
+        current = snapshot(directories)
+        changed = changed_paths(previous, current)
+        previous = current
+        if changed:
+            pending.update(changed)
+            last_change = time.monotonic()
+        elif pending and time.monotonic() - last_change >= debounce:
+            started = time.monotonic()
+            try:
+                rebuild(sorted(pending))
+            except Exception as error:
+                # A half-typed edit must not end the session; the next
+                # save triggers another rebuild
+                print(f"Rebuild failed: {type(error).__name__}: {error}")
+            else:
+                print(f"Rebuilt {len(pending)} changed file(s) in {time.monotonic() - started:.3f}s")
+            pending = set()